@@ -0,0 +1,118 @@
+# bench_vector_index.py
+"""
+Benchmarks the resume vector index options on synthetic, clustered embeddings:
+Chroma's float32 HNSW index (with the configured M / ef_construction / ef_search) against
+the compact float16 and int8 indexes with exact re-ranking.
+
+Reports index memory, mean query latency and recall@k against exact float32 search.
+Memory is measured the same way for every index: the size of the persisted structures
+that are held in RAM while serving (Chroma's HNSW segment files, which mirror hnswlib's
+in-memory layout, and the compact index's codes, scales and ids). The compact index's
+float32 re-rank file is only paged in on demand and is not counted.
+
+Usage:
+    python bench_vector_index.py                    # 10k and 100k chunks
+    python bench_vector_index.py --sizes 10000 --m 32 --ef-search 64
+"""
+import os
+import time
+import argparse
+import tempfile
+
+import numpy as np
+import chromadb
+
+from compact_index import CompactVectorIndex
+from vectorstore_manager import index_metadata
+
+DIM = 768  # models/text-embedding-004
+
+
+def file_bytes(directory, names=None, skip=()):
+    """Total size of the files under `directory` (only `names` if given, never `skip`)."""
+    total = 0
+    for root, _, files in os.walk(directory):
+        for name in files:
+            if (names is None or name in names) and name not in skip:
+                total += os.path.getsize(os.path.join(root, name))
+    return total
+
+
+def make_dataset(n, n_queries, rng):
+    """Clustered unit vectors, roughly like chunks from many resumes on a few topics."""
+    centers = rng.standard_normal((max(8, n // 200), DIM)).astype(np.float32)
+    labels = rng.integers(0, len(centers), n)
+    vectors = centers[labels] + 0.6 * rng.standard_normal((n, DIM)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    picks = rng.integers(0, n, n_queries)
+    queries = vectors[picks] + 0.3 * rng.standard_normal((n_queries, DIM)).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    return vectors, queries
+
+
+def exact_top_k(vectors, queries, k):
+    return [set(np.argsort(-(vectors @ query))[:k]) for query in queries]
+
+
+def recall(results, truth):
+    return float(np.mean([len(set(found) & expected) / len(expected) for found, expected in zip(results, truth)]))
+
+
+def bench_hnsw(vectors, queries, truth, k, metadata):
+    with tempfile.TemporaryDirectory() as directory:
+        client = chromadb.PersistentClient(path=directory)
+        collection = client.create_collection(f"bench_{len(vectors)}", metadata=metadata)
+        ids = [str(i) for i in range(len(vectors))]
+        for start in range(0, len(vectors), 5000):
+            collection.add(ids=ids[start:start + 5000], embeddings=vectors[start:start + 5000].tolist())
+
+        results, start = [], time.perf_counter()
+        for query in queries:
+            hits = collection.query(query_embeddings=[query.tolist()], n_results=k)
+            results.append([int(i) for i in hits["ids"][0]])
+        latency = (time.perf_counter() - start) / len(queries)
+        # The HNSW segment directory only; chroma.sqlite3 holds documents and the write log.
+        memory = file_bytes(directory, skip=("chroma.sqlite3",))
+        client.delete_collection(f"bench_{len(vectors)}")
+        return memory, latency, recall(results, truth)
+
+
+def bench_compact(vectors, queries, truth, k, dtype, rerank_factor):
+    with tempfile.TemporaryDirectory() as directory:
+        index = CompactVectorIndex(directory, dtype=dtype, metric="cosine", rerank_factor=rerank_factor)
+        index.add([str(i) for i in range(len(vectors))], vectors)
+
+        results, start = [], time.perf_counter()
+        for query in queries:
+            results.append([int(doc_id) for doc_id, _ in index.search(query, k=k)])
+        latency = (time.perf_counter() - start) / len(queries)
+        memory = file_bytes(directory, names=("codes.npy", "scales.npy", "index.json"))
+        return memory, latency, recall(results, truth)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=15)
+    parser.add_argument("--m", type=int, default=16)
+    parser.add_argument("--ef-construction", type=int, default=100)
+    parser.add_argument("--ef-search", type=int, default=10)
+    parser.add_argument("--rerank-factor", type=int, default=4)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    metadata = index_metadata("cosine", args.m, args.ef_construction, args.ef_search)
+    print(f"{'chunks':>8}  {'index':<22} {'memory MB':>10} {'query ms':>9} {'recall@' + str(args.k):>10}")
+    for n in args.sizes:
+        vectors, queries = make_dataset(n, args.queries, rng)
+        truth = exact_top_k(vectors, queries, args.k)
+        rows = [(f"hnsw M={args.m} ef={args.ef_search}", bench_hnsw(vectors, queries, truth, args.k, metadata))]
+        for dtype in ("float16", "int8"):
+            rows.append((f"compact-{dtype} x{args.rerank_factor}", bench_compact(vectors, queries, truth, args.k, dtype, args.rerank_factor)))
+        for name, (memory, latency, hit_rate) in rows:
+            print(f"{n:>8}  {name:<22} {memory / 1e6:>10.1f} {latency * 1e3:>9.2f} {hit_rate:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,80 @@
 # bias_checker.py
+import os
+import re
+import json
+import threading
 from langchain.prompts import PromptTemplate
 from langchain.schema.output_parser import StrOutputParser
-from langchain.schema.runnable import RunnablePassthrough
+from langchain.schema.runnable import RunnablePassthrough, RunnableLambda
 
-def create_bias_checker_chain(llm):
+# --- Configuration ---
+BIAS_LEXICON_PATH = os.getenv("BIAS_LEXICON_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "bias_lexicon.json"))
+BIAS_RISK_THRESHOLD = float(os.getenv("BIAS_RISK_THRESHOLD", "1.0"))  # risk at or above this goes to the LLM
+BIAS_CHARS_PER_RISK_POINT = 4000  # long texts are riskier; 4000 characters alone escalate
+NO_BIAS_RESPONSE = "No bias detected."
+
+
+class BiasPrescreen:
+    """
+    Fast local bias screen. Matches the lexicon's phrases (whole words, case-insensitive)
+    and computes a risk score: the summed category weights of the matches plus a length
+    term. Texts with a risk at or above the threshold need the BiasChecker LLM; everything
+    else is resolved locally, so a lone weakly coded term (weight 0.5) in a short text does
+    not escalate on its own.
+    """
+    def __init__(self, lexicon_path=BIAS_LEXICON_PATH, threshold=BIAS_RISK_THRESHOLD):
+        with open(lexicon_path, "r", encoding="utf-8") as f:
+            lexicon = json.load(f)
+        self.threshold = threshold
+        self.weights = {category: entry["weight"] for category, entry in lexicon.items()}
+        # One alternation per category, longest phrases first so multi-word phrases win.
+        self.patterns = {
+            category: re.compile(
+                r"\b(?:" + "|".join(re.escape(p) for p in sorted(entry["phrases"], key=len, reverse=True)) + r")\b",
+                re.IGNORECASE,
+            )
+            for category, entry in lexicon.items()
+        }
+        self._lock = threading.Lock()
+        self.checks = 0
+        self.resolved_locally = 0
+
+    def screen(self, text):
+        """Returns (risk_score, {category: [matched phrases]})."""
+        matches = {}
+        for category, pattern in self.patterns.items():
+            found = sorted({match.lower() for match in pattern.findall(text)})
+            if found:
+                matches[category] = found
+        risk = sum(self.weights[category] for category in matches) + len(text) / BIAS_CHARS_PER_RISK_POINT
+        return risk, matches
+
+    def needs_llm(self, text):
+        """Screens `text`, updates the counters and returns True if the LLM must review it."""
+        risk, matches = self.screen(text)
+        escalate = risk >= self.threshold
+        with self._lock:
+            self.checks += 1
+            if not escalate:
+                self.resolved_locally += 1
+        return escalate
+
+    def stats(self):
+        with self._lock:
+            return {
+                "checks": self.checks,
+                "resolved_locally": self.resolved_locally,
+                "sent_to_llm": self.checks - self.resolved_locally,
+                "local_share": (self.resolved_locally / self.checks) if self.checks else 0.0,
+            }
+
+
+def create_bias_checker_chain(llm, prescreen=None):
     """
     Creates a LangChain chain for the BiasChecker agent.
     This agent is designed to detect and flag potential bias in text.
+    Texts that pass the local BiasPrescreen are answered with "No bias detected."
+    without an LLM call.
     """
     
     template = """
@@ -24,12 +92,27 @@ def create_bias_checker_chain(llm):
     """
     prompt = PromptTemplate.from_template(template)
 
-    chain = (
+    llm_chain = (
         {"text_input": RunnablePassthrough()}
         | prompt
         | llm
         | StrOutputParser()
     )
+
+    if prescreen is None:
+        prescreen = BiasPrescreen()
+
+    def check(text):
+        if not prescreen.needs_llm(str(text)):
+            return NO_BIAS_RESPONSE
+        return llm_chain.invoke(text)
+
+    async def acheck(text):
+        if not prescreen.needs_llm(str(text)):
+            return NO_BIAS_RESPONSE
+        return await llm_chain.ainvoke(text)
+
+    chain = RunnableLambda(check, afunc=acheck)
     
-    print("BiasChecker chain created successfully.")
+    print("BiasChecker chain created successfully (with local pre-screen).")
     return chain
\ No newline at end of file
@@ -0,0 +1,206 @@
+# cassette.py
+import os
+import json
+import time
+import asyncio
+import hashlib
+import threading
+from typing import Any, List, Optional
+
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+# --- Configuration ---
+PROVIDER_MODES = ("live", "record", "replay")
+LATENCY_MODES = ("original", "zero")
+
+
+class CassetteMissError(KeyError):
+    """Raised in replay mode when a request was never recorded."""
+
+
+class Cassette:
+    """
+    A JSONL file of recorded model request/response pairs, one line per call.
+    Identical requests are keyed by a hash of their payload; repeated calls replay
+    the recorded responses in order and then stick to the last one.
+    Recording appends a single line per call, so its cost does not grow with the cassette.
+    """
+    def __init__(self, path, latency_mode="original"):
+        if latency_mode not in LATENCY_MODES:
+            raise ValueError(f"Unknown cassette latency mode '{latency_mode}'. Expected one of {LATENCY_MODES}.")
+        self.path = path
+        self.latency_mode = latency_mode
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._cursors = {}
+        self._file = None  # opened for appending on the first recorded call
+
+        if os.path.exists(self.path):
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # torn last line from an interrupted recording
+                    self._entries.setdefault(entry["key"], []).append(
+                        {"response": entry["response"], "latency": entry["latency"]}
+                    )
+        print(f"--- Cassette loaded from '{self.path}' ({len(self._entries)} recorded requests). ---")
+
+    @staticmethod
+    def make_key(kind, model, payload):
+        raw = json.dumps({"kind": kind, "model": model, "payload": payload}, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def record(self, key, response, latency):
+        # Serialize outside the lock; only the in-memory update and one append are serialized.
+        line = json.dumps({"key": key, "response": response, "latency": latency}, ensure_ascii=False) + "\n"
+        with self._lock:
+            self._entries.setdefault(key, []).append({"response": response, "latency": latency})
+            self._append(line)
+
+    def lookup(self, key):
+        """Returns (response, latency) for the next recorded call with this key."""
+        with self._lock:
+            calls = self._entries.get(key)
+            if not calls:
+                raise CassetteMissError(f"No recorded response in '{self.path}' for request {key[:12]}.")
+            index = self._cursors.get(key, 0)
+            self._cursors[key] = index + 1
+            call = calls[min(index, len(calls) - 1)]
+        latency = call["latency"] if self.latency_mode == "original" else 0.0
+        return call["response"], latency
+
+    def _append(self, line):
+        if self._file is None:
+            directory = os.path.dirname(self.path)
+            if directory and not os.path.exists(directory):
+                os.makedirs(directory)
+            self._file = open(self.path, "a", encoding="utf-8")
+        self._file.write(line)
+        self._file.flush()
+
+
+def _serialize_messages(messages, stop):
+    return {
+        "messages": [{"type": m.type, "content": m.content} for m in messages],
+        "stop": stop,
+    }
+
+
+class CassetteChatModel(BaseChatModel):
+    """
+    Chat model wrapper that records the wrapped model's responses to a cassette,
+    or replays them offline without touching the network.
+    """
+    inner: Optional[Any] = None  # The live model; unused in replay mode.
+    cassette: Any
+    mode: str = "record"
+    recorded_model: str = "gemini-2.5-flash"
+
+    @property
+    def _llm_type(self) -> str:
+        return "cassette-chat"
+
+    def _key(self, messages, stop):
+        return Cassette.make_key("chat", self.recorded_model, _serialize_messages(messages, stop))
+
+    def _result(self, content):
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=content))])
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        key = self._key(messages, stop)
+        if self.mode == "replay":
+            content, latency = self.cassette.lookup(key)
+            if latency:
+                time.sleep(latency)
+            return self._result(content)
+
+        start = time.perf_counter()
+        response = self.inner.invoke(messages, stop=stop, **kwargs)
+        self.cassette.record(key, response.content, time.perf_counter() - start)
+        return self._result(response.content)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        key = self._key(messages, stop)
+        if self.mode == "replay":
+            content, latency = self.cassette.lookup(key)
+            if latency:
+                await asyncio.sleep(latency)
+            return self._result(content)
+
+        start = time.perf_counter()
+        response = await self.inner.ainvoke(messages, stop=stop, **kwargs)
+        self.cassette.record(key, response.content, time.perf_counter() - start)
+        return self._result(response.content)
+
+
+class CassetteEmbeddings(Embeddings):
+    """
+    Embeddings wrapper with the same record/replay behaviour as CassetteChatModel.
+    """
+    def __init__(self, cassette, inner=None, mode="record", model_name="models/text-embedding-004"):
+        self.cassette = cassette
+        self.inner = inner
+        self.mode = mode
+        self.model_name = model_name
+
+    def _call(self, kind, payload, live_call):
+        key = Cassette.make_key(kind, self.model_name, payload)
+        if self.mode == "replay":
+            vectors, latency = self.cassette.lookup(key)
+            if latency:
+                time.sleep(latency)
+            return vectors
+
+        start = time.perf_counter()
+        vectors = live_call()
+        self.cassette.record(key, vectors, time.perf_counter() - start)
+        return vectors
+
+    async def _acall(self, kind, payload, live_coro_factory):
+        key = Cassette.make_key(kind, self.model_name, payload)
+        if self.mode == "replay":
+            vectors, latency = self.cassette.lookup(key)
+            if latency:
+                await asyncio.sleep(latency)
+            return vectors
+
+        start = time.perf_counter()
+        vectors = await live_coro_factory()
+        self.cassette.record(key, vectors, time.perf_counter() - start)
+        return vectors
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._call("embed_documents", list(texts), lambda: self.inner.embed_documents(texts))
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._call("embed_query", text, lambda: self.inner.embed_query(text))
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await self._acall("embed_documents", list(texts), lambda: self.inner.aembed_documents(texts))
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return await self._acall("embed_query", text, lambda: self.inner.aembed_query(text))
+
+
+def wrap_with_cassette(llm, embeddings, mode, cassette_path, latency_mode="original",
+                       llm_model="gemini-2.5-flash", embedding_model="models/text-embedding-004"):
+    """
+    Wraps the live LLM and embeddings clients according to the provider mode.
+    'live' returns them unchanged; 'record' and 'replay' route them through a shared cassette.
+    In replay mode llm and embeddings may be None, since no live client is needed.
+    """
+    if mode not in PROVIDER_MODES:
+        raise ValueError(f"Unknown provider mode '{mode}'. Expected one of {PROVIDER_MODES}.")
+    if mode == "live":
+        return llm, embeddings
+
+    cassette = Cassette(cassette_path, latency_mode=latency_mode)
+    wrapped_llm = CassetteChatModel(inner=llm, cassette=cassette, mode=mode, recorded_model=llm_model)
+    wrapped_embeddings = CassetteEmbeddings(cassette, inner=embeddings, mode=mode, model_name=embedding_model)
+    print(f"--- Provider mode '{mode}' active (cassette: '{cassette_path}', latency: {latency_mode}). ---")
+    return wrapped_llm, wrapped_embeddings
@@ -0,0 +1,46 @@
+# check_resume_chunking.py
+"""
+Checks that the resume chunker finds section headings in the bundled sample resumes,
+so a regression to the generic fallback (every chunk tagged section="unknown") or to
+chunks that mix several sections is caught.
+
+Usage:
+    python check_resume_chunking.py                 # resumes/*.pdf
+    python check_resume_chunking.py path/to/cv.pdf
+"""
+import sys
+import glob
+import argparse
+
+from pdf_extraction import extract_pdf_pages, PDF_MAX_PAGES
+from vectorstore_manager import split_resume_documents
+from langchain_core.documents import Document
+
+EXPECTED_SECTIONS = {"summary", "skills", "experience", "education"}
+
+
+def chunk_sections(path):
+    with open(path, "rb") as f:
+        pages = extract_pdf_pages(f.read(), PDF_MAX_PAGES)
+    documents = [Document(page_content=text, metadata={"source": path, "page": i}) for i, text in enumerate(pages)]
+    chunks = split_resume_documents(documents)
+    return {chunk.metadata["section"] for chunk in chunks}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="*", default=sorted(glob.glob("resumes/*.pdf")))
+    args = parser.parse_args()
+
+    failed = False
+    for path in args.paths:
+        sections = chunk_sections(path)
+        missing = EXPECTED_SECTIONS - sections
+        status = "ok" if not missing else f"MISSING {', '.join(sorted(missing))}"
+        print(f"{path:<32} {', '.join(sorted(sections)):<50} {status}")
+        failed = failed or bool(missing)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+# compact_index.py
+import os
+import json
+import asyncio
+import threading
+from typing import Any, List
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+# --- Configuration ---
+COMPACT_DTYPES = ("float16", "int8")
+DISTANCE_METRICS = ("cosine", "l2", "ip")
+SCAN_BLOCK_ROWS = 8192  # rows dequantized at a time while scanning, bounds temporary memory
+
+
+def quantize_int8(vectors):
+    """Symmetric per-vector int8 quantization. Returns (codes, scales)."""
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    codes = np.round(vectors / scales[:, None]).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+def similarity(matrix, query, metric):
+    """Higher is better for every metric, so results can always be sorted descending."""
+    if metric == "l2":
+        return -np.sum((matrix - query) ** 2, axis=1)
+    return matrix @ query  # cosine vectors are normalized on insert, so this covers cosine and ip
+
+
+class CompactVectorIndex:
+    """
+    Memory-compact vector index. Only float16 or int8-quantized vectors are held in RAM;
+    full-precision float32 vectors are appended to a file on disk and memory-mapped.
+    A search scans the compact vectors, then re-ranks the top `k * rerank_factor`
+    candidates exactly against the float32 vectors.
+    """
+    def __init__(self, directory, dtype="int8", metric="cosine", rerank_factor=4):
+        if dtype not in COMPACT_DTYPES:
+            raise ValueError(f"Unknown compact dtype '{dtype}'. Expected one of {COMPACT_DTYPES}.")
+        if metric not in DISTANCE_METRICS:
+            raise ValueError(f"Unknown distance metric '{metric}'. Expected one of {DISTANCE_METRICS}.")
+        self.directory = directory
+        self.dtype = dtype
+        self.metric = metric
+        self.rerank_factor = rerank_factor
+        self._lock = threading.Lock()
+
+        self.ids = []
+        self.dim = None
+        self.codes = None
+        self.scales = None
+        self._full = None  # memmap over the float32 file, reopened after appends
+
+        if not os.path.exists(self.directory):
+            os.makedirs(self.directory)
+        self._load()
+
+    # --- Persistence ---
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def _load(self):
+        meta_path = self._path("index.json")
+        if not os.path.exists(meta_path):
+            return
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta["dtype"] != self.dtype or meta["metric"] != self.metric:
+            raise ValueError(
+                f"Compact index in '{self.directory}' was built with dtype={meta['dtype']}, "
+                f"metric={meta['metric']}; delete it to rebuild with new settings."
+            )
+        self.ids = meta["ids"]
+        self.dim = meta["dim"]
+        self.codes = np.load(self._path("codes.npy"))
+        if self.dtype == "int8":
+            self.scales = np.load(self._path("scales.npy"))
+        self._open_full()
+
+    def _save(self):
+        np.save(self._path("codes.npy"), self.codes)
+        if self.dtype == "int8":
+            np.save(self._path("scales.npy"), self.scales)
+        meta = {"ids": self.ids, "dim": self.dim, "dtype": self.dtype, "metric": self.metric}
+        temp_path = self._path("index.json.tmp")
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(temp_path, self._path("index.json"))
+
+    def _open_full(self):
+        self._full = np.memmap(self._path("full.f32"), dtype=np.float32, mode="r", shape=(len(self.ids), self.dim))
+
+    # --- Index operations ---
+    def _prepare(self, vectors):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if self.metric == "cosine":
+            norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+            norms[norms == 0] = 1.0
+            vectors = vectors / norms
+        return vectors
+
+    def add(self, ids, vectors):
+        if not len(ids):
+            return
+        vectors = self._prepare(vectors)
+        with self._lock:
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+            full_path = self._path("full.f32")
+            if os.path.exists(full_path):
+                # Drop any tail left by a crash between the append and the metadata save.
+                os.truncate(full_path, len(self.ids) * self.dim * 4)
+            with open(full_path, "ab") as f:
+                f.write(vectors.tobytes())
+            if self.dtype == "int8":
+                codes, scales = quantize_int8(vectors)
+                self.codes = codes if self.codes is None else np.concatenate([self.codes, codes])
+                self.scales = scales if self.scales is None else np.concatenate([self.scales, scales])
+            else:
+                codes = vectors.astype(np.float16)
+                self.codes = codes if self.codes is None else np.concatenate([self.codes, codes])
+            self.ids.extend(ids)
+            self._save()
+            self._open_full()
+
+    def _approximate_scores(self, query):
+        scores = np.empty(len(self.ids), dtype=np.float32)
+        for start in range(0, len(self.ids), SCAN_BLOCK_ROWS):
+            block = self.codes[start:start + SCAN_BLOCK_ROWS].astype(np.float32)
+            if self.dtype == "int8":
+                block *= self.scales[start:start + SCAN_BLOCK_ROWS, None]
+            scores[start:start + len(block)] = similarity(block, query, self.metric)
+        return scores
+
+    def search(self, query_vector, k=4):
+        """Returns [(id, score)] for the k best matches, best first."""
+        query = self._prepare(query_vector)
+        with self._lock:
+            if not self.ids:
+                return []
+            ids, full = self.ids, self._full
+            scores = self._approximate_scores(query)
+        candidates = min(len(ids), k * self.rerank_factor)
+        top = np.argpartition(-scores, candidates - 1)[:candidates]
+        # Exact re-rank of the shortlist with the full-precision vectors.
+        exact = similarity(np.asarray(full[np.sort(top)]), query, self.metric)
+        ranked = sorted(zip(np.sort(top), exact), key=lambda pair: pair[1], reverse=True)[:k]
+        return [(ids[row], float(score)) for row, score in ranked]
+
+    def memory_bytes(self):
+        """Bytes of vector data held in RAM (the float32 file is only paged in for re-ranking)."""
+        total = self.codes.nbytes if self.codes is not None else 0
+        if self.scales is not None:
+            total += self.scales.nbytes
+        return total
+
+
+class CompactRetriever(BaseRetriever):
+    """
+    Retriever over a CompactVectorIndex; document text and metadata are fetched from the
+    Chroma collection by id.
+    """
+    index: Any
+    collection: Any
+    embeddings: Any
+    k: int = 4
+
+    def _to_documents(self, hits):
+        if not hits:
+            return []
+        ids = [doc_id for doc_id, _ in hits]
+        data = self.collection.get(ids=ids, include=["documents", "metadatas"])
+        by_id = {doc_id: (text, meta) for doc_id, text, meta in zip(data["ids"], data["documents"], data["metadatas"])}
+        return [Document(page_content=by_id[doc_id][0], metadata=by_id[doc_id][1] or {}) for doc_id in ids if doc_id in by_id]
+
+    def _search(self, query_vector):
+        return self._to_documents(self.index.search(query_vector, k=self.k))
+
+    def _get_relevant_documents(self, query, *, run_manager=None) -> List[Document]:
+        return self._search(self.embeddings.embed_query(query))
+
+    async def _aget_relevant_documents(self, query, *, run_manager=None) -> List[Document]:
+        query_vector = await self.embeddings.aembed_query(query)
+        # The O(n) scan and the Chroma lookup are blocking; keep them off the event loop.
+        return await asyncio.to_thread(self._search, query_vector)
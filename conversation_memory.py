@@ -0,0 +1,134 @@
+# conversation_memory.py
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List
+
+from langchain.prompts import PromptTemplate
+from langchain.schema import BaseMemory
+from langchain.schema.output_parser import StrOutputParser
+from langchain_core.messages import AIMessage, HumanMessage
+
+# --- Configuration ---
+MAX_INPUT_CHARS = 300  # user turns are kept verbatim up to this length
+MAX_REFERENCE_CHARS = 300  # outputs are cut to this until the background summary replaces them
+
+# Summaries are produced off the response path, one at a time.
+_summary_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="memory-summarizer")
+
+
+def estimate_tokens(text):
+    """Rough token count (about 4 characters per token for English text)."""
+    return len(text) // 4 + 1
+
+
+def _truncate(text, limit):
+    """Collapses whitespace and cuts `text` to at most `limit` characters, marker included."""
+    text = " ".join(text.split())
+    if len(text) <= limit:
+        return text
+    if limit < 8:
+        return text[:limit]
+    return text[:limit - 4].rsplit(" ", 1)[0] + " ..."
+
+
+def compact_reference(output):
+    """
+    Cheap structured reference for an assistant turn, built without an LLM call.
+    TalentScout reports become "Ranked candidates: A, B, C (sources: x, y, z)".
+    """
+    names = re.findall(r"\*\*\d+\.\s*(.+?)\*\*", output)
+    sources = re.findall(r"Source:\*\*\s*`?\[?([^`\]\n]+)\]?`?", output)
+    if names:
+        reference = "Ranked candidates: " + ", ".join(name.strip() for name in names)
+        if sources:
+            reference += " (sources: " + ", ".join(source.strip() for source in sources) + ")"
+        return _truncate(reference, MAX_REFERENCE_CHARS)
+    return _truncate(output, MAX_REFERENCE_CHARS)
+
+
+def create_turn_summarizer_chain(llm):
+    """
+    Creates a chain that condenses one assistant reply for the conversation history.
+    """
+    template = """
+    Summarize the following HR assistant reply in at most 40 words for use as conversation history.
+    Keep every candidate name, source filename, score, number of days and policy fact needed to answer follow-up questions. Drop formatting, bias analyses and explanations.
+
+    REPLY:
+    {reply}
+
+    SUMMARY:
+    """
+    prompt = PromptTemplate.from_template(template)
+    return prompt | llm | StrOutputParser()
+
+
+class CompactConversationMemory(BaseMemory):
+    """
+    Conversation memory that stores each turn as a compact reference instead of the raw
+    exchange. The user's words are kept (truncated); the reply is stored as a structured
+    reference right away and later replaced by a short LLM summary computed in the
+    background. Oldest turns are dropped to keep the history under `max_tokens`.
+    """
+    summarizer: Any = None
+    summarize_initializer: Any = None  # called in the summarizer thread before each summary
+    memory_key: str = "chat_history"
+    input_key: str = "input"
+    output_key: str = "output"
+    return_messages: bool = True
+    max_tokens: int = 600
+    turns: List[Dict[str, str]] = []
+
+    @property
+    def memory_variables(self) -> List[str]:
+        return [self.memory_key]
+
+    def _history_tokens(self):
+        return sum(estimate_tokens(turn["input"]) + estimate_tokens(turn["output"]) for turn in self.turns)
+
+    def load_memory_variables(self, inputs: Dict[str, Any]) -> Dict[str, Any]:
+        if self.return_messages:
+            messages = []
+            for turn in self.turns:
+                messages.extend([HumanMessage(content=turn["input"]), AIMessage(content=turn["output"])])
+            return {self.memory_key: messages}
+        history = "\n".join(f"Human: {turn['input']}\nAI: {turn['output']}" for turn in self.turns)
+        return {self.memory_key: history}
+
+    def save_context(self, inputs: Dict[str, Any], outputs: Dict[str, str]) -> None:
+        output = str(outputs.get(self.output_key, ""))
+        turn = {
+            "input": _truncate(str(inputs.get(self.input_key, "")), MAX_INPUT_CHARS),
+            "output": compact_reference(output),
+        }
+        self.turns.append(turn)
+        while len(self.turns) > 1 and self._history_tokens() > self.max_tokens:
+            self.turns.pop(0)
+        if self._history_tokens() > self.max_tokens:
+            self._trim_to_fit(turn)
+
+        # Structured references are already compact; only free-text replies are summarized.
+        if self.summarizer is not None and not turn["output"].startswith("Ranked candidates:") \
+                and len(output) > MAX_REFERENCE_CHARS:
+            _summary_executor.submit(self._summarize, turn, output)
+
+    def _trim_to_fit(self, turn):
+        """Cuts the newest turn (now the only one) down so the history fits in max_tokens."""
+        # estimate_tokens adds one token per field, hence the two reserved tokens.
+        budget = max(0, (self.max_tokens - 2) * 4)
+        turn["input"] = _truncate(turn["input"], budget // 2)
+        turn["output"] = _truncate(turn["output"], budget - len(turn["input"]))
+
+    def _summarize(self, turn, output):
+        try:
+            if self.summarize_initializer:
+                self.summarize_initializer()
+            summary = self.summarizer.invoke({"reply": output}).strip()
+            if summary:
+                # Never longer than the reference it replaces, so the history stays under the cap.
+                turn["output"] = _truncate(summary, min(MAX_REFERENCE_CHARS, len(turn["output"])))
+        except Exception as e:
+            print(f"!!! Failed to summarize conversation turn: {e}")
+
+    def clear(self) -> None:
+        self.turns = []
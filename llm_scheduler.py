@@ -0,0 +1,331 @@
+# llm_scheduler.py
+import time
+import heapq
+import asyncio
+import itertools
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Any, List
+
+from tenacity import (
+    AsyncRetrying,
+    Retrying,
+    retry_if_exception,
+    stop_after_attempt,
+    wait_random_exponential,
+)
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+
+# --- Configuration ---
+# Workloads map to priorities; lower numbers are admitted first.
+WORKLOAD_PRIORITIES = {
+    "interactive": 0,  # /chat and everything it triggers
+    "ingest": 10,      # uploads: guardrails sanitization and document embedding
+}
+DEFAULT_CLASS_LIMITS = {
+    "interactive": 8,
+    "ingest": 2,
+    "embedding": 4,
+}
+
+_current_workload = contextvars.ContextVar("llm_workload", default="interactive")
+
+
+@contextmanager
+def workload(name):
+    """
+    Tags every model call made inside the block (including from LangChain executor threads)
+    with the given workload, e.g. `with workload("ingest"): ...`.
+    """
+    if name not in WORKLOAD_PRIORITIES:
+        raise ValueError(f"Unknown workload '{name}'. Expected one of {list(WORKLOAD_PRIORITIES)}.")
+    token = _current_workload.set(name)
+    try:
+        yield
+    finally:
+        _current_workload.reset(token)
+
+
+def set_workload(name):
+    """Sets the workload for the rest of the current thread or task (e.g. a background thread)."""
+    if name not in WORKLOAD_PRIORITIES:
+        raise ValueError(f"Unknown workload '{name}'. Expected one of {list(WORKLOAD_PRIORITIES)}.")
+    _current_workload.set(name)
+
+
+def current_workload():
+    return _current_workload.get()
+
+
+def is_rate_limit_error(exc):
+    """Best-effort detection of Gemini quota / 429 errors across client library versions."""
+    text = f"{type(exc).__name__} {exc}".lower()
+    return any(marker in text for marker in ("resourceexhausted", "resource_exhausted", "429", "rate limit", "quota"))
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket. `reserve()` takes a token immediately and returns how long
+    the caller must wait before using it, so callers can sleep with time or asyncio.
+    """
+    def __init__(self, rate_per_second, burst):
+        self.rate = rate_per_second
+        self.capacity = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        if not self.rate:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.rate
+
+
+class _Waiter:
+    def __init__(self, call_class, wake):
+        self.call_class = call_class
+        self.wake = wake
+
+
+class LLMScheduler:
+    """
+    Coordinates every Gemini call made by the application.
+    Enforces a global concurrency cap and per-class caps, admits waiting calls in
+    priority order (interactive before ingest), rate-limits with a token bucket and
+    retries rate-limit errors with jittered exponential backoff.
+    Works for both sync callers (threads) and async callers (event loop).
+    """
+    def __init__(self, max_concurrency=8, class_limits=None, requests_per_minute=0, burst=None,
+                 max_attempts=5, backoff_max=30.0):
+        self.max_concurrency = max_concurrency
+        self.class_limits = dict(DEFAULT_CLASS_LIMITS, **(class_limits or {}))
+        self.bucket = TokenBucket(requests_per_minute / 60.0, burst or max(1, max_concurrency))
+        self.max_attempts = max_attempts
+        self.backoff_max = backoff_max
+
+        self._lock = threading.Lock()
+        self._queue = []  # heap of (priority, seq, waiter)
+        self._seq = itertools.count()
+        self._in_flight = 0
+        self._class_in_flight = {}
+        self._stats = {
+            "calls": 0,
+            "retries": 0,
+            "rate_limit_errors": 0,
+            "total_wait_seconds": 0.0,
+            "max_wait_seconds": 0.0,
+        }
+
+    # --- Admission ---
+    def _has_capacity(self, call_class):
+        limit = self.class_limits.get(call_class, self.max_concurrency)
+        return self._in_flight < self.max_concurrency and self._class_in_flight.get(call_class, 0) < limit
+
+    def _grant(self, call_class):
+        self._in_flight += 1
+        self._class_in_flight[call_class] = self._class_in_flight.get(call_class, 0) + 1
+
+    def _try_admit_or_enqueue(self, call_class, priority, wake):
+        """Must be called with the lock held. Returns True if admitted immediately."""
+        # Releases admit every eligible waiter under the lock, so spare capacity here
+        # never belongs to someone already queued.
+        if self._has_capacity(call_class):
+            self._grant(call_class)
+            return True
+        heapq.heappush(self._queue, (priority, next(self._seq), _Waiter(call_class, wake)))
+        return False
+
+    def _release(self, call_class):
+        to_wake = []
+        with self._lock:
+            self._in_flight -= 1
+            self._class_in_flight[call_class] -= 1
+            # Admit waiters in priority order; a waiter whose class is full is skipped
+            # so it cannot block other classes behind it.
+            skipped = []
+            while self._queue and self._in_flight < self.max_concurrency:
+                entry = heapq.heappop(self._queue)
+                waiter = entry[2]
+                if self._has_capacity(waiter.call_class):
+                    self._grant(waiter.call_class)
+                    to_wake.append(waiter)
+                else:
+                    skipped.append(entry)
+            for entry in skipped:
+                heapq.heappush(self._queue, entry)
+        for waiter in to_wake:
+            waiter.wake()
+
+    def _record_wait(self, waited):
+        with self._lock:
+            self._stats["calls"] += 1
+            self._stats["total_wait_seconds"] += waited
+            self._stats["max_wait_seconds"] = max(self._stats["max_wait_seconds"], waited)
+
+    def _acquire(self, call_class, priority):
+        start = time.monotonic()
+        event = threading.Event()
+        with self._lock:
+            admitted = self._try_admit_or_enqueue(call_class, priority, event.set)
+        if not admitted:
+            event.wait()
+        delay = self.bucket.reserve()
+        if delay:
+            time.sleep(delay)
+        self._record_wait(time.monotonic() - start)
+
+    async def _aacquire(self, call_class, priority):
+        start = time.monotonic()
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def wake():
+            loop.call_soon_threadsafe(lambda: future.done() or future.set_result(None))
+
+        with self._lock:
+            admitted = self._try_admit_or_enqueue(call_class, priority, wake)
+        if not admitted:
+            try:
+                await future
+            except asyncio.CancelledError:
+                # If the slot was granted just as we were cancelled, hand it back.
+                if future.done() and not future.cancelled():
+                    self._release(call_class)
+                else:
+                    self._discard_waiter(wake, call_class)
+                raise
+        delay = self.bucket.reserve()
+        if delay:
+            try:
+                await asyncio.sleep(delay)
+            except asyncio.CancelledError:
+                self._release(call_class)
+                raise
+        self._record_wait(time.monotonic() - start)
+
+    def _discard_waiter(self, wake, call_class):
+        with self._lock:
+            for i, entry in enumerate(self._queue):
+                if entry[2].wake is wake:
+                    self._queue.pop(i)
+                    heapq.heapify(self._queue)
+                    return
+        # Already granted between cancellation and cleanup.
+        self._release(call_class)
+
+    # --- Execution ---
+    def _on_retry(self, retry_state):
+        with self._lock:
+            self._stats["retries"] += 1
+            self._stats["rate_limit_errors"] += 1
+        print(f"--- Rate limited by provider, retrying (attempt {retry_state.attempt_number + 1}/{self.max_attempts}). ---")
+
+    def _retry_kwargs(self):
+        return dict(
+            retry=retry_if_exception(is_rate_limit_error),
+            wait=wait_random_exponential(multiplier=1, max=self.backoff_max),
+            stop=stop_after_attempt(self.max_attempts),
+            before_sleep=self._on_retry,
+            reraise=True,
+        )
+
+    def run(self, func, call_class=None):
+        """Runs a blocking model call under the scheduler."""
+        workload_name = current_workload()
+        call_class = call_class or workload_name
+        priority = WORKLOAD_PRIORITIES.get(workload_name, 0)
+        for attempt in Retrying(**self._retry_kwargs()):
+            with attempt:
+                self._acquire(call_class, priority)
+                try:
+                    return func()
+                finally:
+                    self._release(call_class)
+
+    async def arun(self, coro_factory, call_class=None):
+        """Runs a model coroutine (created by coro_factory on each attempt) under the scheduler."""
+        workload_name = current_workload()
+        call_class = call_class or workload_name
+        priority = WORKLOAD_PRIORITIES.get(workload_name, 0)
+        async for attempt in AsyncRetrying(**self._retry_kwargs()):
+            with attempt:
+                await self._aacquire(call_class, priority)
+                try:
+                    return await coro_factory()
+                finally:
+                    self._release(call_class)
+
+    def stats(self):
+        """Snapshot of queue depth, in-flight calls and wait times, for tuning."""
+        with self._lock:
+            queued = {}
+            for _, _, waiter in self._queue:
+                queued[waiter.call_class] = queued.get(waiter.call_class, 0) + 1
+            calls = self._stats["calls"]
+            return {
+                "max_concurrency": self.max_concurrency,
+                "class_limits": dict(self.class_limits),
+                "in_flight": self._in_flight,
+                "in_flight_by_class": dict(self._class_in_flight),
+                "queue_depth": len(self._queue),
+                "queue_depth_by_class": queued,
+                "calls": calls,
+                "retries": self._stats["retries"],
+                "rate_limit_errors": self._stats["rate_limit_errors"],
+                "avg_wait_seconds": (self._stats["total_wait_seconds"] / calls) if calls else 0.0,
+                "max_wait_seconds": self._stats["max_wait_seconds"],
+            }
+
+
+class ScheduledChatModel(BaseChatModel):
+    """
+    Chat model wrapper that routes every call of the wrapped model through an LLMScheduler.
+    """
+    inner: Any
+    scheduler: Any
+
+    @property
+    def _llm_type(self) -> str:
+        return "scheduled-chat"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        return self.scheduler.run(lambda: self.inner._generate(messages, stop=stop, **kwargs))
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        return await self.scheduler.arun(lambda: self.inner._agenerate(messages, stop=stop, **kwargs))
+
+
+class ScheduledEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that routes calls through an LLMScheduler under the 'embedding' class.
+    Priority still follows the caller's workload.
+    """
+    def __init__(self, inner, scheduler):
+        self.inner = inner
+        self.scheduler = scheduler
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.scheduler.run(lambda: self.inner.embed_documents(texts), call_class="embedding")
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.scheduler.run(lambda: self.inner.embed_query(text), call_class="embedding")
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await self.scheduler.arun(lambda: self.inner.aembed_documents(texts), call_class="embedding")
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return await self.scheduler.arun(lambda: self.inner.aembed_query(text), call_class="embedding")
+
+
+def wrap_with_scheduler(llm, embeddings, scheduler: LLMScheduler):
+    """Returns scheduler-routed versions of the LLM and embeddings clients."""
+    return ScheduledChatModel(inner=llm, scheduler=scheduler), ScheduledEmbeddings(embeddings, scheduler)
@@ -1,6 +1,10 @@
 # main.py
+import time
+_IMPORT_START = time.perf_counter()  # Measure import cost for the startup timing report
+
 import os
 import asyncio
+import threading
 from dotenv import load_dotenv
 from fastapi import FastAPI, HTTPException, UploadFile, File, Request
 from pydantic import BaseModel
@@ -15,22 +19,67 @@ from langchain.agents import AgentExecutor
 from langchain.schema.output_parser import OutputParserException
 
 # Local Imports
-from vectorstore_manager import VectorStoreManager
+from vectorstore_manager import VectorStoreManager, CHROMA_MODE, lock_persist_directory
+from pdf_extraction import PDFExtractionError
 from talent_scout import create_talent_scout_chain, Candidate # Import Candidate
-from onboarder import create_onboarder_chain
+from onboarder import create_onboarder_chain, OnboardingPlanCache, pregenerate_onboarding_plans
 from policy_bot import create_policy_retriever, create_policy_bot_chain
-from bias_checker import create_bias_checker_chain
+from bias_checker import create_bias_checker_chain, BiasPrescreen
 from orchestrator import create_orchestrator
 from security import create_guardrails_agent # Import GuardrailsAgent
+from ranking_jobs import RankingJobManager
+from conversation_memory import CompactConversationMemory, create_turn_summarizer_chain
+from cassette import wrap_with_cassette
+from llm_scheduler import LLMScheduler, wrap_with_scheduler, workload, set_workload
+from startup import ComponentRegistry
+
+IMPORT_SECONDS = time.perf_counter() - _IMPORT_START
 
 # --- Configuration ---
 load_dotenv()
+
+# Provider mode: "live" calls Gemini directly, "record" calls Gemini and saves every
+# request/response pair to the cassette, "replay" serves them offline from the cassette.
+PROVIDER_MODE = os.getenv("PROVIDER_MODE", "live").lower()
+CASSETTE_PATH = os.getenv("CASSETTE_PATH", "cassettes/default.jsonl")
+CASSETTE_LATENCY = os.getenv("CASSETTE_LATENCY", "original").lower()  # "original" or "zero"
+
 API_KEY = os.getenv("GOOGLE_API_KEY")
-if not API_KEY:
+if not API_KEY and PROVIDER_MODE != "replay":
     raise ValueError("GOOGLE_API_KEY not found in .env file.")
 
+# Shared Gemini call scheduler: concurrency caps, priorities, rate limiting and retries.
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_CLASS_LIMITS = {
+    "interactive": int(os.getenv("LLM_INTERACTIVE_CONCURRENCY", "8")),
+    "ingest": int(os.getenv("LLM_INGEST_CONCURRENCY", "2")),
+    "embedding": int(os.getenv("LLM_EMBEDDING_CONCURRENCY", "4")),
+}
+LLM_REQUESTS_PER_MINUTE = int(os.getenv("LLM_REQUESTS_PER_MINUTE", "0"))  # 0 disables rate limiting
+LLM_MAX_ATTEMPTS = int(os.getenv("LLM_MAX_ATTEMPTS", "5"))
+
+LLM_MODEL = "gemini-2.5-flash"
+EMBEDDING_MODEL = "models/text-embedding-004"
+
 MAX_FILE_SIZE = 10 * 1024 * 1024  # 10 MB
 REQUEST_TIMEOUT = 120.0  # 120 seconds
+# Warm components up in the background at startup; if false they are built on first use.
+EAGER_WARMUP = os.getenv("EAGER_WARMUP", "true").lower() == "true"
+COMPONENT_WAIT_TIMEOUT = float(os.getenv("COMPONENT_WAIT_TIMEOUT", "60"))  # seconds a request waits for a component
+
+# Onboarding plans are cached per (days, words, details); optionally pre-generate generic
+# plans for common day counts in the background, e.g. ONBOARDING_PREGENERATE_DAYS="3,5,7,10".
+ONBOARDING_CACHE_SIZE = int(os.getenv("ONBOARDING_CACHE_SIZE", "128"))
+ONBOARDING_PREGENERATE_DAYS = [int(days) for days in os.getenv("ONBOARDING_PREGENERATE_DAYS", "").split(",") if days.strip()]
+
+# Conversation memory: "window" replays the last 5 raw exchanges; "compact" keeps a short
+# reference or background summary of each turn, capped at MEMORY_MAX_TOKENS.
+MEMORY_MODE = os.getenv("MEMORY_MODE", "window").lower()
+MEMORY_MAX_TOKENS = int(os.getenv("MEMORY_MAX_TOKENS", "600"))
+
+# Every .txt/.md/.pdf under this directory is indexed; edits are hot-reloaded without a restart.
+POLICY_DIRECTORY = os.getenv("POLICY_DIRECTORY", "policies")
+POLICY_HOT_RELOAD = os.getenv("POLICY_HOT_RELOAD", "true").lower() == "true"
 
 # --- Pydantic Models ---
 class ChatRequest(BaseModel):
@@ -46,6 +95,9 @@ class UploadResponse(BaseModel):
 class DocumentListResponse(BaseModel):
     documents: List[str]
 
+class RankJobRequest(BaseModel):
+    job_description: str
+
 # --- FastAPI App Initialization ---
 app = FastAPI(
     title="Aegis HR - Agentic HR Automation (Hardened)",
@@ -54,44 +106,189 @@ app = FastAPI(
 )
 
 # --- Global Components ---
-llm = ChatGoogleGenerativeAI(model="gemini-2.5-flash", temperature=0.3, google_api_key=API_KEY)
-embeddings = GoogleGenerativeAIEmbeddings(model="models/text-embedding-004", google_api_key=API_KEY)
-vector_store_manager = VectorStoreManager(embeddings=embeddings, llm=llm) # Pass llm here for sanitization
-orchestrator: AgentExecutor = None
-guardrails_agent = None # Initialize later
+# The scheduler is cheap and process-wide; everything that talks to Gemini or Chroma is
+# built lazily through the component registry so the server accepts traffic immediately.
+llm_scheduler = LLMScheduler(
+    max_concurrency=LLM_MAX_CONCURRENCY,
+    class_limits=LLM_CLASS_LIMITS,
+    requests_per_minute=LLM_REQUESTS_PER_MINUTE,
+    max_attempts=LLM_MAX_ATTEMPTS,
+)
+components = ComponentRegistry()
+onboarding_plan_cache = OnboardingPlanCache(max_size=ONBOARDING_CACHE_SIZE)
+bias_prescreen = BiasPrescreen()
 
-# --- FastAPI Startup Event ---
-@app.on_event("startup")
-async def startup_event():
-    global orchestrator, guardrails_agent
-    print("--- Server is starting up, initializing AI agent... ---")
-    
+
+def build_model_clients():
+    llm = None
+    embeddings = None
+    if PROVIDER_MODE != "replay":
+        # Retries are handled by the scheduler so a backing-off call does not hold a concurrency slot.
+        llm = ChatGoogleGenerativeAI(model=LLM_MODEL, temperature=0.3, google_api_key=API_KEY, max_retries=1)
+        embeddings = GoogleGenerativeAIEmbeddings(model=EMBEDDING_MODEL, google_api_key=API_KEY)
+    llm, embeddings = wrap_with_cassette(
+        llm, embeddings, PROVIDER_MODE, CASSETTE_PATH, CASSETTE_LATENCY,
+        llm_model=LLM_MODEL, embedding_model=EMBEDDING_MODEL,
+    )
+    return wrap_with_scheduler(llm, embeddings, llm_scheduler)
+
+
+def build_vector_store(clients, guardrails_agent):
+    llm, embeddings = clients
+    return VectorStoreManager(embeddings=embeddings, llm=llm, guardrails_agent=guardrails_agent)
+
+
+def build_policy_retriever(clients):
+    _, embeddings = clients
+    policy_retriever = create_policy_retriever(POLICY_DIRECTORY, embeddings)
+    if POLICY_HOT_RELOAD:
+        # Re-embedding edited policies is background work for the LLM scheduler.
+        policy_retriever.index.start_watching(initializer=lambda: set_workload("ingest"))
+    return policy_retriever
+
+
+def build_policy_bot(clients, policy_retriever):
+    llm, _ = clients
+    return create_policy_bot_chain(policy_retriever, llm)
+
+
+def start_onboarding_pregeneration(onboarder_chain):
+    def run():
+        # Background work: yields to interactive traffic in the LLM scheduler.
+        with workload("ingest"):
+            pregenerate_onboarding_plans(onboarder_chain, ONBOARDING_PREGENERATE_DAYS)
+
+    threading.Thread(target=run, name="onboarding-pregenerate", daemon=True).start()
+
+
+def build_orchestrator(clients, vector_store_manager, policy_bot_chain):
+    llm, _ = clients
     retriever = vector_store_manager.get_retriever()
-    
-    # --- CORRECTED ORDER OF INITIALIZATION ---
 
     # 1. Create chains that have no dependencies on other chains
-    onboarder_chain = create_onboarder_chain(llm)
-    policy_retriever = create_policy_retriever("policies/company_policies.txt", embeddings)
-    policy_bot_chain = create_policy_bot_chain(policy_retriever, llm)
-    bias_checker_chain = create_bias_checker_chain(llm) # CREATE BIAS CHECKER FIRST
-    guardrails_agent = create_guardrails_agent(llm) # Initialize GuardrailsAgent
+    onboarder_chain = create_onboarder_chain(llm, plan_cache=onboarding_plan_cache)
+    if ONBOARDING_PREGENERATE_DAYS:
+        start_onboarding_pregeneration(onboarder_chain)
+    bias_checker_chain = create_bias_checker_chain(llm, prescreen=bias_prescreen) # CREATE BIAS CHECKER FIRST
 
     # 2. Now create the TalentScout chain, which depends on the bias checker
     talent_scout_chain = create_talent_scout_chain(retriever, llm, bias_checker_chain)
-    
-    # 3. Finally, create the tools list with all the finished chains
+
+    # 3. Finally, create the tools list with all the finished chains.
+    #    Each tool has a native coroutine so orchestrator.ainvoke never needs a thread executor.
     tools = [
-        Tool(name="TalentScout", func=talent_scout_chain.invoke, description="For screening resumes, comparing candidates, and analyzing skills."),
-        Tool(name="Onboarder", func=onboarder_chain.invoke, description="For creating onboarding plans."),
-        Tool(name="PolicyBot", func=policy_bot_chain.invoke, description="For answering questions about company policies."),
-        Tool(name="BiasChecker", func=bias_checker_chain.invoke, description="For analyzing text to detect potential ethical or demographic bias. Use this to review summaries or justifications created by other tools."),
+        Tool(name="TalentScout", func=talent_scout_chain.invoke, coroutine=talent_scout_chain.ainvoke, description="For screening resumes, comparing candidates, and analyzing skills."),
+        Tool(name="Onboarder", func=onboarder_chain.invoke, coroutine=onboarder_chain.ainvoke, description="For creating onboarding plans."),
+        Tool(name="PolicyBot", func=policy_bot_chain.invoke, coroutine=policy_bot_chain.ainvoke, description="For answering questions about company policies."),
+        Tool(name="BiasChecker", func=bias_checker_chain.invoke, coroutine=bias_checker_chain.ainvoke, description="For analyzing text to detect potential ethical or demographic bias. Use this to review summaries or justifications created by other tools."),
     ]
 
-    memory = ConversationBufferWindowMemory(k=5, memory_key="chat_history", input_key="input", output_key="output", return_messages=True)
-    orchestrator = create_orchestrator(llm, tools, memory)
-    
-    print("--- AI Agent initialized successfully. Server is ready. ---")
+    # The executor runs without memory: /chat passes the history in and saves the turn itself,
+    # only after guardrails have cleared the input.
+    return create_orchestrator(llm, tools, memory=None)
+
+
+def build_memory(llm):
+    if MEMORY_MODE == "compact":
+        return CompactConversationMemory(
+            summarizer=create_turn_summarizer_chain(llm),
+            # Summaries are background work for the LLM scheduler.
+            summarize_initializer=lambda: set_workload("ingest"),
+            max_tokens=MEMORY_MAX_TOKENS,
+        )
+    return ConversationBufferWindowMemory(k=5, memory_key="chat_history", input_key="input", output_key="output", return_messages=True)
+
+
+components.register("model_clients", build_model_clients)
+components.register("guardrails", lambda clients: create_guardrails_agent(clients[0]), depends_on=["model_clients"])
+components.register("vector_store", build_vector_store, depends_on=["model_clients", "guardrails"])
+components.register("policy_retriever", build_policy_retriever, depends_on=["model_clients"])
+components.register("policy_bot", build_policy_bot, depends_on=["model_clients", "policy_retriever"])
+components.register("ranking_jobs", lambda clients, vector_store_manager: RankingJobManager(vector_store_manager, clients[0]), depends_on=["model_clients", "vector_store"])
+components.register("memory", lambda clients: build_memory(clients[0]), depends_on=["model_clients"])
+components.register("orchestrator", build_orchestrator, depends_on=["model_clients", "vector_store", "policy_bot"])
+
+
+async def require(name):
+    """
+    Waits for a component to become ready, building it on demand.
+    Raises 503 if it fails to initialize or is not ready within COMPONENT_WAIT_TIMEOUT.
+    """
+    try:
+        return await asyncio.wait_for(components.get(name), timeout=COMPONENT_WAIT_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=503, detail=f"Component '{name}' is still warming up. Please retry shortly.")
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"Component '{name}' failed to initialize: {str(e)}")
+
+
+# --- FastAPI Startup Event ---
+@app.on_event("startup")
+async def startup_event():
+    print(f"--- Server is starting up (imports took {IMPORT_SECONDS:.2f}s). ---")
+    if CHROMA_MODE == "embedded":
+        # Claim chroma_db/ before serving, so a second worker process fails startup here
+        # instead of staying up and answering 503 once the vector store is first built.
+        lock_persist_directory()
+    if EAGER_WARMUP:
+        components.warm_up_in_background()
+        print("--- Background warm-up started. Server is accepting requests. ---")
+    else:
+        print("--- Lazy startup: components will be initialized on first use. ---")
+    # Resume only once the ranking component exists, so lazy startup stays lazy.
+    components.on_ready("ranking_jobs", resume_ranking_jobs)
+
+
+def resume_ranking_jobs(manager):
+    """Restarts ranking jobs interrupted by a previous shutdown, at background priority."""
+    # Tasks started here copy this context, so their LLM calls run as ingest work.
+    with workload("ingest"):
+        manager.resume_incomplete_jobs()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    vector_store_manager = components.get_if_ready("vector_store")
+    if vector_store_manager:
+        vector_store_manager.pdf_extractor.shutdown()
+    policy_retriever = components.get_if_ready("policy_retriever")
+    if policy_retriever:
+        policy_retriever.index.stop_watching()
+
+
+# --- Health and Readiness ---
+
+@app.get("/healthz")
+async def healthz():
+    """
+    Liveness probe: the process is up and serving requests.
+    """
+    return {"status": "ok"}
+
+
+@app.get("/readyz")
+async def readyz():
+    """
+    Readiness probe: per-component readiness. Returns 503 if a component failed to
+    initialize or, with eager warm-up, until every component is ready. With lazy startup
+    components stay "pending" until first use, which does not hold back readiness.
+    """
+    body = {"ready": components.ready(expected=None if EAGER_WARMUP else ()), "components": components.readiness(), "errors": components.errors}
+    if not body["ready"]:
+        raise HTTPException(status_code=503, detail=body)
+    return body
+
+
+@app.get("/startup/report")
+async def startup_report():
+    """
+    Startup timing report: import cost and per-component initialization times in seconds.
+    """
+    return {
+        "import_seconds": round(IMPORT_SECONDS, 3),
+        "component_seconds": {name: round(seconds, 3) for name, seconds in components.timings.items()},
+        "components": components.readiness(),
+    }
 
 # --- Robust Endpoints ---
 
@@ -100,6 +297,7 @@ async def get_documents():
     """
     NEW ENDPOINT: Returns a list of all unique documents in the vector store.
     """
+    vector_store_manager = await require("vector_store")
     try:
         doc_list = vector_store_manager.list_documents()
         return {"documents": doc_list}
@@ -115,14 +313,52 @@ async def upload_resume(file: UploadFile = File(...)):
     if not file.filename.lower().endswith('.pdf'):
         raise HTTPException(status_code=400, detail="Invalid file type. Only PDFs are accepted.")
 
+    vector_store_manager = await require("vector_store")
     try:
-        vector_store_manager.add_document_from_upload(file)
+        data = await file.read()
+        with workload("ingest"):
+            await vector_store_manager.aadd_document(data, file.filename)
         return {"message": "File processed successfully.", "filename": file.filename}
+    except PDFExtractionError as e:
+        raise HTTPException(status_code=422, detail=f"Could not extract PDF: {str(e)}")
     except Exception as e:
         print(f"!!! Critical error during file upload: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to process file: {str(e)}")
     
 
+@app.get("/scheduler/stats")
+async def scheduler_stats():
+    """
+    Returns queue depth, in-flight calls and wait times of the shared LLM scheduler.
+    """
+    return llm_scheduler.stats()
+
+
+@app.get("/bias/stats")
+async def bias_stats():
+    """
+    Returns how many bias checks were resolved by the local pre-screen versus sent to the LLM.
+    """
+    return bias_prescreen.stats()
+
+
+@app.get("/onboarding/cache/stats")
+async def onboarding_cache_stats():
+    """
+    Returns size and hit/miss counts of the onboarding plan cache.
+    """
+    return onboarding_plan_cache.stats()
+
+
+@app.get("/vectordb/index")
+async def vectordb_index():
+    """
+    Returns the vector index configuration (distance, HNSW parameters or compact mode).
+    """
+    vector_store_manager = await require("vector_store")
+    return vector_store_manager.index_config()
+
+
 # In main.py (temporarily)
 
 @app.get("/debug/vectordb")
@@ -130,6 +366,7 @@ async def debug_vectordb():
     """
     Temporary endpoint to inspect the vector database.
     """
+    vector_store_manager = await require("vector_store")
     collection = vector_store_manager.vector_store._collection
     data = collection.get(include=["documents"])
     return data
@@ -167,23 +404,69 @@ def extract_candidate_info(text: str) -> List[Candidate]:
     return candidates
 
 
+@app.post("/rank-jobs")
+async def create_rank_job(request: RankJobRequest):
+    """
+    Starts a bulk ranking job: every resume is scored independently against the job
+    description and merged into a global ranking. Poll GET /rank-jobs/{job_id} for progress.
+    """
+    if not request.job_description.strip():
+        raise HTTPException(status_code=400, detail="job_description must not be empty.")
+    manager = await require("ranking_jobs")
+    # Bulk scoring is background work; it yields to interactive chat in the LLM scheduler.
+    with workload("ingest"):
+        return manager.create_job(request.job_description)
+
+
+@app.get("/rank-jobs/{job_id}")
+async def get_rank_job(job_id: str):
+    """
+    Returns a ranking job's status, progress and the ranking computed so far.
+    """
+    if not re.fullmatch(r"[0-9a-f]{32}", job_id):
+        raise HTTPException(status_code=404, detail="Ranking job not found.")
+    manager = await require("ranking_jobs")
+    job = manager.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Ranking job not found.")
+    return job
+
+
 @app.post("/chat", response_model=ChatResponse)
 async def chat(request: ChatRequest):
-    if not orchestrator:
-        raise HTTPException(status_code=503, detail="AI Agent is not ready.")
-    
+    guardrails_agent = await require("guardrails")
+    orchestrator: AgentExecutor = await require("orchestrator")
+    memory = await require("memory")
+
+    # Speculative execution: the guardrails check and the orchestrator start together, and
+    # nothing from the orchestrator is released until the guardrails verdict is benign.
+    # The speculative run only reads the history; the turn is saved after the verdict.
+    history = memory.load_memory_variables({"input": request.message})[memory.memory_key]
+    orchestration_task = asyncio.create_task(
+        asyncio.wait_for(
+            orchestrator.ainvoke({"input": request.message, "chat_history": history}),
+            timeout=REQUEST_TIMEOUT,
+        )
+    )
+    # Retrieve the result of a discarded task so its errors are not logged as unhandled.
+    orchestration_task.add_done_callback(lambda task: task.cancelled() or task.exception())
+
     # Input Validation using GuardrailsAgent
     if guardrails_agent:
-        guardrails_response = guardrails_agent.invoke(request.message)
+        try:
+            guardrails_response = await guardrails_agent.ainvoke(request.message)
+        except Exception as e:
+            orchestration_task.cancel()
+            print(f"!!! Guardrails check failed: {e}")
+            raise HTTPException(status_code=500, detail=f"Security check failed: {str(e)}")
         if guardrails_response.lower().strip() == "yes":
+            orchestration_task.cancel()
             return {"response": "I'm sorry, I cannot process that request. It has been identified as potentially harmful."}
-    
+
     try:
-        response = await asyncio.wait_for(
-            orchestrator.ainvoke({"input": request.message}),
-            timeout=REQUEST_TIMEOUT
-        )
-        
+        response = await orchestration_task
+        memory.save_context({"input": request.message}, {"output": response.get("output", "")})
+
         # Output Validation and Parsing
         if "TalentScout" in [step[0].name for step in response.get("intermediate_steps", [])]:  # Check if TalentScout was used
             string_output = response.get("output")
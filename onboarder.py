@@ -1,5 +1,7 @@
 # onboarder.py
 import re
+import threading
+from collections import OrderedDict
 from langchain.prompts import PromptTemplate
 from langchain.schema.output_parser import StrOutputParser
 from langchain.output_parsers import PydanticOutputParser # Modified import
@@ -53,7 +55,73 @@ def parse_and_format_onboarding_input(input_data):
     return {"details": details, "days": days, "words": words}
 
 
-def create_onboarder_chain(llm):
+# Words that carry no information about the new hire; requests that reduce to only these
+# share the generic plan for their (days, words) pair.
+_FILLER_WORDS = {
+    "a", "an", "the", "for", "of", "to", "and", "with", "me", "my", "our", "please", "can", "you",
+    "create", "generate", "make", "write", "draft", "build", "give", "need", "i", "we",
+    "onboarding", "plan", "new", "hire", "employee", "starter", "day", "days", "word", "words",
+    "long", "about", "approximately", "around",
+}
+
+
+def normalize_onboarding_key(parsed):
+    """
+    Reduces parsed onboarding input to a cache key: (days, words, normalised details).
+    Details are lower-cased, stripped of punctuation and filler words, so phrasing
+    variants of the same request map to the same plan.
+    """
+    tokens = re.findall(r"[a-z0-9+#]+", parsed["details"].lower())
+    details = " ".join(token for token in tokens if token not in _FILLER_WORDS)
+    return (parsed["days"], parsed["words"], details)
+
+
+class OnboardingPlanCache:
+    """
+    Thread-safe LRU cache of generated onboarding plans, keyed by normalize_onboarding_key.
+    """
+    def __init__(self, max_size=128):
+        self.max_size = max_size
+        self._plans = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            if key in self._plans:
+                self._plans.move_to_end(key)
+                self.hits += 1
+                return self._plans[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, plan):
+        with self._lock:
+            self._plans[key] = plan
+            self._plans.move_to_end(key)
+            while len(self._plans) > self.max_size:
+                self._plans.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            return {"size": len(self._plans), "max_size": self.max_size, "hits": self.hits, "misses": self.misses}
+
+
+def pregenerate_onboarding_plans(onboarder_chain, day_variants, words=200):
+    """
+    Generates the generic plan for each day count so common requests are served from the
+    cache. Blocking; run it in a background thread.
+    """
+    for days in day_variants:
+        try:
+            onboarder_chain.invoke(f"Create a {days} day onboarding plan of {words} words for a new employee.")
+        except Exception as e:
+            print(f"!!! Failed to pre-generate {days}-day onboarding plan: {e}")
+    print(f"--- Pre-generated onboarding plans for day counts: {list(day_variants)} ---")
+
+
+def create_onboarder_chain(llm, plan_cache=None):
     """
     Creates a more robust LangChain chain for the Onboarder agent.
     This version handles different input types gracefully.
@@ -123,15 +191,32 @@ Additional details from the user: {details}
     prompt = PromptTemplate.from_template(template)
     output_parser = PydanticOutputParser(pydantic_object=OnboardingPlan)
 
-    # This new chain is simpler and more direct.
-    # 1. The RunnableLambda now handles all parsing and formatting.
-    # 2. The output of the lambda is passed directly to the prompt.
-    chain = (
-        RunnableLambda(parse_and_format_onboarding_input)
-        | prompt
-        | llm
-        | output_parser
-    )
+    # The generation chain takes the parsed input straight into the prompt.
+    generation_chain = prompt | llm | output_parser
+
+    if plan_cache is None:
+        plan_cache = OnboardingPlanCache()
+
+    # Parsing happens first so the cache can be checked before any LLM call.
+    def generate_with_cache(input_data):
+        parsed = parse_and_format_onboarding_input(input_data)
+        key = normalize_onboarding_key(parsed)
+        plan = plan_cache.get(key)
+        if plan is None:
+            plan = generation_chain.invoke(parsed)
+            plan_cache.put(key, plan)
+        return plan
+
+    async def agenerate_with_cache(input_data):
+        parsed = parse_and_format_onboarding_input(input_data)
+        key = normalize_onboarding_key(parsed)
+        plan = plan_cache.get(key)
+        if plan is None:
+            plan = await generation_chain.ainvoke(parsed)
+            plan_cache.put(key, plan)
+        return plan
+
+    chain = RunnableLambda(generate_with_cache, afunc=agenerate_with_cache)
     
-    print("Onboarder chain created successfully (Robust Dynamic Version).")
+    print("Onboarder chain created successfully (Robust Dynamic Version, cached).")
     return chain
@@ -0,0 +1,193 @@
+# pdf_extraction.py
+import io
+import os
+import time
+import signal
+import asyncio
+import threading
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
+
+from pypdf import PdfReader
+from pypdf.errors import PyPdfError
+from langchain_core.documents import Document
+
+# --- Configuration ---
+PDF_MAX_PAGES = int(os.getenv("PDF_MAX_PAGES", "50"))
+PDF_EXTRACT_TIMEOUT = float(os.getenv("PDF_EXTRACT_TIMEOUT", "30"))  # seconds per file
+PDF_KILL_GRACE = 5.0  # extra seconds before a worker that ignores its own deadline is killed
+PDF_POOL_WORKERS = int(os.getenv("PDF_POOL_WORKERS", "0"))  # 0 = share the cores between uvicorn workers
+# Worker processes can't see uvicorn's --workers flag, so the core share relies on
+# WEB_CONCURRENCY (which uvicorn also reads as its worker count) or PDF_POOL_WORKERS.
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))
+
+
+class PDFExtractionError(ValueError):
+    """Raised when a PDF cannot be extracted (too many pages, timeout or unreadable)."""
+
+
+def available_cores():
+    """Number of cores this process may run on (respects CPU affinity / container limits)."""
+    if hasattr(os, "sched_getaffinity"):
+        return max(1, len(os.sched_getaffinity(0)))
+    return os.cpu_count() or 1
+
+
+def _raise_timeout(signum, frame):
+    raise TimeoutError
+
+
+def extract_pdf_pages(data, max_pages, timeout=None):
+    """
+    Extracts the text of each page from in-memory PDF bytes.
+    Runs inside a worker process, so it only takes and returns plain picklable values.
+    The timeout is measured from when this worker starts on the file, not from when it was
+    queued, and is enforced in the worker so the pool (and other files in it) stay untouched.
+    """
+    deadline = time.monotonic() + timeout if timeout else None
+    # SIGALRM interrupts a page that hangs mid-parse; the per-page deadline check covers
+    # platforms without it.
+    use_alarm = deadline is not None and hasattr(signal, "setitimer") \
+        and threading.current_thread() is threading.main_thread()
+    if use_alarm:
+        previous_handler = signal.signal(signal.SIGALRM, _raise_timeout)
+    try:
+        if use_alarm:
+            signal.setitimer(signal.ITIMER_REAL, timeout)
+        reader = PdfReader(io.BytesIO(data))
+        page_count = len(reader.pages)
+        if page_count > max_pages:
+            raise PDFExtractionError(f"PDF has {page_count} pages; the limit is {max_pages}.")
+        pages = []
+        for page in reader.pages:
+            if deadline is not None and time.monotonic() > deadline:
+                raise TimeoutError
+            pages.append(page.extract_text() or "")
+        return pages
+    except TimeoutError:
+        raise PDFExtractionError(f"Timed out after {timeout:g}s.") from None
+    except PyPdfError as e:
+        raise PDFExtractionError(f"Unreadable PDF: {e}") from None
+    finally:
+        if use_alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, previous_handler)
+
+
+def _worker_main(conn):
+    """
+    Extraction worker loop: receives (data, max_pages, timeout) jobs over a pipe and sends
+    back ("ok", pages), ("invalid", message) for bad PDFs or ("failed", message).
+    """
+    while True:
+        try:
+            job = conn.recv()
+        except EOFError:
+            return
+        if job is None:
+            return
+        try:
+            reply = ("ok", extract_pdf_pages(*job))
+        except PDFExtractionError as e:
+            reply = ("invalid", str(e))
+        except Exception as e:
+            reply = ("failed", f"{type(e).__name__}: {e}")
+        conn.send(reply)
+
+
+def _round_trip(conn, job):
+    conn.send(job)
+    return conn.recv()
+
+
+class _Worker:
+    def __init__(self, context):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child_conn,), name="pdf-extractor", daemon=True)
+        self.process.start()
+        child_conn.close()
+
+    def kill(self):
+        self.process.kill()
+        self.process.join(timeout=1)
+        self.conn.close()
+
+
+class PDFExtractor:
+    """
+    Extracts PDF text in a pool of worker processes sized to the available cores, so
+    CPU-bound parsing neither holds the server's GIL nor blocks other requests.
+    Each file gets a timeout that starts when a worker picks it up, so files queued behind a
+    bulk ingest are not penalised. The worker enforces it itself; if a worker is stuck where
+    it cannot (e.g. inside zlib), it is killed after a grace period and replaced, without
+    touching the files other workers are parsing.
+    """
+    def __init__(self, max_workers=None, max_pages=PDF_MAX_PAGES, timeout=PDF_EXTRACT_TIMEOUT):
+        # With several uvicorn workers, each gets its share of the cores rather than all of them.
+        self.max_workers = max_workers or PDF_POOL_WORKERS or max(1, available_cores() // max(1, WEB_CONCURRENCY))
+        self.max_pages = max_pages
+        self.timeout = timeout
+        # "spawn" keeps workers independent of the server's threads and open clients.
+        self._context = multiprocessing.get_context("spawn")
+        self._slots = asyncio.Semaphore(self.max_workers)
+        self._idle = []
+        self._lock = threading.Lock()
+        # One thread per worker waits on its pipe, so waiting never uses the default executor.
+        self._waiters = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="pdf-wait")
+
+    def _checkout(self):
+        with self._lock:
+            while self._idle:
+                worker = self._idle.pop()
+                if worker.process.is_alive():
+                    return worker
+                worker.conn.close()
+        return _Worker(self._context)
+
+    def _checkin(self, worker):
+        with self._lock:
+            self._idle.append(worker)
+
+    def _to_documents(self, pages, filename):
+        return [
+            Document(page_content=text, metadata={"source": filename, "page": index})
+            for index, text in enumerate(pages)
+        ]
+
+    async def aextract(self, data, filename):
+        """Async extraction; the event loop stays free while a worker parses the file."""
+        async with self._slots:
+            worker = self._checkout()
+            job = (data, self.max_pages, self.timeout)
+            waiting = asyncio.get_running_loop().run_in_executor(self._waiters, _round_trip, worker.conn, job)
+            try:
+                status, payload = await asyncio.wait_for(waiting, timeout=self.timeout + PDF_KILL_GRACE)
+            except asyncio.TimeoutError:
+                worker.kill()
+                raise PDFExtractionError(f"'{filename}': Timed out after {self.timeout:g}s.") from None
+            except asyncio.CancelledError:
+                worker.kill()  # its result would arrive after nobody is listening
+                raise
+            except (EOFError, OSError):
+                worker.kill()
+                raise PDFExtractionError(f"'{filename}': The extraction worker crashed on this file.") from None
+            self._checkin(worker)
+
+        if status == "invalid":
+            raise PDFExtractionError(f"'{filename}': {payload}")
+        if status == "failed":
+            raise RuntimeError(f"Extracting '{filename}' failed: {payload}")
+        return self._to_documents(payload, filename)
+
+    def shutdown(self):
+        with self._lock:
+            workers, self._idle = self._idle, []
+        for worker in workers:
+            try:
+                worker.conn.send(None)
+            except OSError:
+                pass
+            worker.process.join(timeout=1)
+            if worker.process.is_alive():
+                worker.kill()
+        self._waiters.shutdown(wait=False, cancel_futures=True)
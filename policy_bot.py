@@ -1,28 +1,175 @@
 # policy_bot.py
 
+import os
+import time
+import hashlib
+import threading
+from typing import Any, List
+
 from langchain_community.document_loaders import TextLoader
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_community.vectorstores import FAISS
 from langchain.prompts import PromptTemplate
 from langchain.schema.runnable import RunnablePassthrough
 from langchain.schema.output_parser import StrOutputParser
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+from pdf_extraction import extract_pdf_pages, PDF_MAX_PAGES
+
+# --- Configuration ---
+POLICY_EXTENSIONS = (".txt", ".md", ".markdown", ".pdf")
+POLICY_RELOAD_INTERVAL = float(os.getenv("POLICY_RELOAD_INTERVAL", "5"))  # seconds between directory scans
+POLICY_RETRY_MAX_DELAY = 600.0  # cap on the backoff before a file that failed to index is retried
+
+
+def _load_policy_file(file_path):
+    """Loads one policy file (text, Markdown or PDF) into page documents."""
+    if file_path.lower().endswith(".pdf"):
+        with open(file_path, "rb") as f:
+            pages = extract_pdf_pages(f.read(), PDF_MAX_PAGES)
+        return [Document(page_content=text, metadata={"source": file_path, "page": i}) for i, text in enumerate(pages)]
+    return TextLoader(file_path, encoding="utf-8").load()
 
-def create_policy_retriever(file_path, embeddings):
+
+class PolicyIndex:
+    """
+    FAISS index over every policy document under a directory (or a single file).
+    `refresh()` re-embeds only chunks whose text changed in added or modified files, then
+    builds a new FAISS index from the stored vectors and swaps it in with one assignment,
+    so queries running against the previous index are never blocked.
+    """
+    def __init__(self, path, embeddings):
+        self.path = path
+        self.embeddings = embeddings
+        self.text_splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=100)
+        self.current = None  # The live FAISS index; replaced atomically on reload
+        self._files = {}  # file path -> (mtime, [(text, metadata, vector)])
+        self._vectors = {}  # sha256(chunk text) -> embedding, reused across reloads
+        self._failed = {}  # file path -> (mtime, failures, retry_at); retried on backoff or when the file changes
+        self._refresh_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._watcher = None
+
+    def _policy_files(self):
+        if os.path.isfile(self.path):
+            return [self.path]
+        found = []
+        for root, _, filenames in os.walk(self.path):
+            for filename in filenames:
+                if filename.lower().endswith(POLICY_EXTENSIONS):
+                    found.append(os.path.join(root, filename))
+        return sorted(found)
+
+    def _index_file(self, file_path, mtime):
+        chunks = self.text_splitter.split_documents(_load_policy_file(file_path))
+        keys = [hashlib.sha256(chunk.page_content.encode("utf-8")).hexdigest() for chunk in chunks]
+        new_texts = {key: chunk.page_content for key, chunk in zip(keys, chunks) if key not in self._vectors}
+        if new_texts:
+            vectors = self.embeddings.embed_documents(list(new_texts.values()))
+            self._vectors.update(zip(new_texts.keys(), vectors))
+        self._files[file_path] = (mtime, [(chunk.page_content, chunk.metadata, key) for chunk, key in zip(chunks, keys)])
+        print(f"Indexed policy file '{file_path}': {len(chunks)} chunks, {len(new_texts)} re-embedded.")
+
+    def refresh(self):
+        """Re-indexes added/changed files and drops deleted ones. Returns True if the index changed."""
+        with self._refresh_lock:
+            changed = False
+            files = self._policy_files()
+            for file_path in files:
+                mtime = os.path.getmtime(file_path)
+                if file_path in self._files and self._files[file_path][0] == mtime:
+                    continue
+                failed_mtime, failures, retry_at = self._failed.get(file_path, (None, 0, 0.0))
+                if failed_mtime == mtime and time.monotonic() < retry_at:
+                    continue
+                try:
+                    self._index_file(file_path, mtime)
+                    self._failed.pop(file_path, None)
+                    changed = True
+                except Exception as e:
+                    failures = failures + 1 if failed_mtime == mtime else 1
+                    delay = min(POLICY_RELOAD_INTERVAL * 2 ** failures, POLICY_RETRY_MAX_DELAY)
+                    self._failed[file_path] = (mtime, failures, time.monotonic() + delay)
+                    print(f"!!! Failed to index policy file '{file_path}' (retrying in {delay:g}s or when it changes): {e}")
+            for file_path in set(self._failed) - set(files):
+                del self._failed[file_path]
+            for file_path in set(self._files) - set(files):
+                del self._files[file_path]
+                changed = True
+                print(f"Removed policy file '{file_path}' from the index.")
+
+            if changed or self.current is None:
+                self._swap_index()
+            return changed
+
+    def _swap_index(self):
+        entries = [entry for _, file_entries in self._files.values() for entry in file_entries]
+        if not entries:
+            self.current = None
+            return
+        live_keys = {key for _, _, key in entries}
+        self._vectors = {key: vector for key, vector in self._vectors.items() if key in live_keys}
+        self.current = FAISS.from_embeddings(
+            [(text, self._vectors[key]) for text, _, key in entries],
+            self.embeddings,
+            metadatas=[metadata for _, metadata, _ in entries],
+        )
+
+    def start_watching(self, interval=POLICY_RELOAD_INTERVAL, initializer=None):
+        """
+        Polls the policy directory in a daemon thread and hot-reloads on changes.
+        `initializer` is called once in the watcher thread before polling starts.
+        """
+        def watch():
+            if initializer:
+                initializer()
+            while not self._stop.wait(interval):
+                try:
+                    if self.refresh():
+                        print("--- Policy index reloaded. ---")
+                except Exception as e:
+                    print(f"!!! Policy reload failed: {e}")
+
+        self._watcher = threading.Thread(target=watch, name="policy-watcher", daemon=True)
+        self._watcher.start()
+
+    def stop_watching(self):
+        self._stop.set()
+
+
+class PolicyRetriever(BaseRetriever):
+    """
+    Retriever that always queries the PolicyIndex's current FAISS index.
     """
-    Creates a retriever for the company policy document.
+    index: Any
+    k: int = 4
+
+    def _get_relevant_documents(self, query, *, run_manager=None) -> List[Document]:
+        db = self.index.current
+        return db.similarity_search(query, k=self.k) if db is not None else []
+
+    async def _aget_relevant_documents(self, query, *, run_manager=None) -> List[Document]:
+        db = self.index.current
+        return await db.asimilarity_search(query, k=self.k) if db is not None else []
+
+
+def create_policy_retriever(path, embeddings):
+    """
+    Creates a retriever over the company policy documents.
+    `path` may be a directory (every .txt/.md/.pdf file under it is indexed) or a single file.
+    Call `retriever.index.start_watching()` to hot-reload edits.
     This performs the Load, Split, and Store steps of RAG.
+    Raises ValueError if no policy file could be indexed.
     """
-    print(f"Processing policy document from: {file_path}")
-    loader = TextLoader(file_path)
-    documents = loader.load()
-    
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=100)
-    docs = text_splitter.split_documents(documents)
-    
-    db = FAISS.from_documents(docs, embeddings)
-    
-    print("Policy document processed and retriever created.")
-    return db.as_retriever()
+    print(f"Processing policy documents from: {path}")
+    index = PolicyIndex(path, embeddings)
+    index.refresh()
+    if index.current is None:
+        raise ValueError(f"No policy documents could be indexed from '{path}'.")
+
+    print("Policy documents processed and retriever created.")
+    return PolicyRetriever(index=index)
 
 def create_policy_bot_chain(retriever, llm):
     """
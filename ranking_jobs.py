@@ -0,0 +1,330 @@
+# ranking_jobs.py
+import os
+import re
+import copy
+import json
+import uuid
+import time
+import asyncio
+import hashlib
+import threading
+
+from langchain.prompts import PromptTemplate
+from langchain.schema.output_parser import StrOutputParser
+
+# --- Configuration ---
+RANK_JOBS_DIRECTORY = os.getenv("RANK_JOBS_DIRECTORY", "rank_jobs")
+RANK_JOB_CONCURRENCY = int(os.getenv("RANK_JOB_CONCURRENCY", "8"))  # candidates scored at once per job
+RANK_JOB_SAVE_INTERVAL = float(os.getenv("RANK_JOB_SAVE_INTERVAL", "2"))  # seconds between progress saves
+MAX_RESUME_CHARS = 8000  # keeps each scoring call small
+
+# Identifies this process as a job owner; unlike the pid it is never reused after a restart.
+PROCESS_TOKEN = uuid.uuid4().hex
+
+
+def _sha256(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _write_json(path, data):
+    # Write to a temp file and swap it in so readers never see a half-written file.
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=1)
+    os.replace(temp_path, path)
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except (OSError, TypeError):
+        return False
+    return True
+
+
+def create_candidate_scorer_chain(llm):
+    """
+    Creates a small chain that scores ONE resume against a job description.
+    Uses the same rubric as TalentScout so scores are comparable.
+    """
+    template = """
+    You are an expert HR analyst named TalentScout. Score the single candidate below against the job description using ONLY the resume text.
+
+**JOB DESCRIPTION:**
+{job_description}
+
+**RESUME ({source}):**
+{resume}
+
+**SCORING (total out of 20):** Relevance of Experience (0-5), Skills Match (0-5), Education (0-3), Certifications (0-2), Overall Fit (0-5).
+Base the justification on skills and experience only. Do not refer to age, gender, origin or other protected characteristics.
+
+Respond with EXACTLY these three lines and nothing else:
+NAME: [full name from the resume, or Name Not Found]
+SCORE: [total score as a number from 0 to 20]
+JUSTIFICATION: [one or two sentences]
+    """
+    prompt = PromptTemplate.from_template(template)
+    return prompt | llm | StrOutputParser()
+
+
+def parse_candidate_score(text):
+    """Parses the scorer output into {"name", "score", "justification"}."""
+    name_match = re.search(r"NAME:\s*(.+)", text)
+    score_match = re.search(r"SCORE:\s*(\d+(?:\.\d+)?)", text)
+    justification_match = re.search(r"JUSTIFICATION:\s*(.+)", text, re.DOTALL)
+    return {
+        "name": name_match.group(1).strip() if name_match else "Name Not Found",
+        "score": min(20.0, float(score_match.group(1))) if score_match else 0.0,
+        "justification": justification_match.group(1).strip() if justification_match else text.strip(),
+    }
+
+
+class ScoreCache:
+    """
+    Persistent cache of candidate scores keyed by (JD hash, resume hash), so re-running a
+    job description, or resuming a job, never re-scores an unchanged resume.
+    Entries are appended to a JSONL file, one line per score, so each put costs one small
+    write and entries appended by other worker processes are picked up on a cache miss.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._scores = {}
+        self._offset = 0
+        self._read_new_entries()
+
+    def _read_new_entries(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "rb") as f:
+            f.seek(self._offset)
+            data = f.read()
+        # Only consume complete lines; a line still being written is read next time.
+        end = data.rfind(b"\n") + 1
+        for line in data[:end].splitlines():
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue  # torn line from a crash mid-write
+            self._scores[entry["key"]] = entry["result"]
+        self._offset += end
+
+    def get(self, jd_hash, resume_hash):
+        key = f"{jd_hash}:{resume_hash}"
+        with self._lock:
+            if key not in self._scores:
+                self._read_new_entries()
+            return self._scores.get(key)
+
+    def put(self, jd_hash, resume_hash, result):
+        key = f"{jd_hash}:{resume_hash}"
+        line = (json.dumps({"key": key, "result": result}, ensure_ascii=False) + "\n").encode("utf-8")
+        with self._lock:
+            self._scores[key] = result
+            # A single O_APPEND write keeps lines from concurrent workers intact.
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, line)
+            finally:
+                os.close(fd)
+
+
+class RankingJobManager:
+    """
+    Runs "rank all candidates for this JD" as a map-reduce job: every resume is scored
+    independently and in parallel (map), then the scores are merged into a global ranking
+    (reduce). Job state is persisted as it progresses (at most every RANK_JOB_SAVE_INTERVAL
+    seconds), so progress and partial results can be read at any time and unfinished jobs
+    resume after a restart. Scores finished since the last save are still in the score
+    cache, so a resumed job does not re-score them.
+    """
+    def __init__(self, vector_store_manager, llm, directory=RANK_JOBS_DIRECTORY, concurrency=RANK_JOB_CONCURRENCY,
+                 save_interval=RANK_JOB_SAVE_INTERVAL):
+        self.vector_store_manager = vector_store_manager
+        self.scorer_chain = create_candidate_scorer_chain(llm)
+        self.directory = directory
+        self.concurrency = concurrency
+        self.save_interval = save_interval
+        self._last_saved = {}
+        if not os.path.exists(self.directory):
+            os.makedirs(self.directory)
+        self.score_cache = ScoreCache(os.path.join(self.directory, "score_cache.jsonl"))
+        self._jobs = {}
+        self._tasks = {}
+        self._lock = threading.Lock()
+
+    # --- Persistence ---
+    def _job_path(self, job_id):
+        return os.path.join(self.directory, f"job_{job_id}.json")
+
+    def _write(self, snapshot):
+        with self._lock:
+            _write_json(self._job_path(snapshot["id"]), snapshot)
+
+    def _save(self, job):
+        self._write(copy.deepcopy(job))
+
+    async def _asave(self, job, force=False):
+        # Throttled: a full rewrite per candidate would make large jobs quadratic.
+        if not force and time.monotonic() - self._last_saved.get(job["id"], 0) < self.save_interval:
+            return
+        self._last_saved[job["id"]] = time.monotonic()
+        # Snapshot on the event loop (where the job is mutated), write in a worker thread.
+        await asyncio.to_thread(self._write, copy.deepcopy(job))
+
+    def _claim(self, job):
+        """
+        Atomically claims an orphaned job. The claim file is named after the previous owner,
+        so when several workers find the same orphaned job only one can create it.
+        """
+        previous_owner = job.get("owner_token") or job.get("owner_pid")
+        path = os.path.join(self.directory, f"job_{job['id']}.{previous_owner}.claim")
+        try:
+            fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+        except FileExistsError:
+            return False
+        os.write(fd, str(os.getpid()).encode("ascii"))
+        os.close(fd)
+        return True
+
+    def _remove_claims(self, job_id):
+        prefix = f"job_{job_id}."
+        for filename in os.listdir(self.directory):
+            if filename.startswith(prefix) and filename.endswith(".claim"):
+                try:
+                    os.remove(os.path.join(self.directory, filename))
+                except FileNotFoundError:
+                    pass
+
+    def _load(self, job_id):
+        path = self._job_path(job_id)
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    # --- Public API ---
+    def create_job(self, job_description):
+        """Creates and starts a ranking job. Must be called from the event loop."""
+        job = {
+            "id": uuid.uuid4().hex,
+            "job_description": job_description,
+            "jd_hash": _sha256(job_description.strip()),
+            "status": "running",
+            "owner_pid": os.getpid(),
+            "owner_token": PROCESS_TOKEN,
+            "created_at": time.time(),
+            "updated_at": time.time(),
+            "total": None,
+            "results": {},  # source -> {"name", "score", "justification", "resume_hash"}
+            "errors": {},
+        }
+        self._jobs[job["id"]] = job
+        self._save(job)
+        self._start(job)
+        return self.get_job(job["id"])
+
+    def get_job(self, job_id):
+        """
+        Returns job status, progress and the ranking so far (best first), or None.
+        Falls back to the state on disk, so any worker can report on any job.
+        """
+        job = self._jobs.get(job_id) or self._load(job_id)
+        if job is None:
+            return None
+        results = job["results"]
+        ranking = sorted(
+            ({"source": source, **result} for source, result in results.items()),
+            key=lambda candidate: candidate["score"],
+            reverse=True,
+        )
+        for rank, candidate in enumerate(ranking, start=1):
+            candidate["rank"] = rank
+            candidate.pop("resume_hash", None)
+        return {
+            "id": job["id"],
+            "status": job["status"],
+            "progress": {"scored": len(results), "failed": len(job["errors"]), "total": job["total"]},
+            "ranking": ranking,
+            "errors": job["errors"],
+        }
+
+    def resume_incomplete_jobs(self):
+        """Restarts jobs left running by a process that is no longer alive. Call from the event loop."""
+        resumed = 0
+        for filename in os.listdir(self.directory):
+            if not (filename.startswith("job_") and filename.endswith(".json")):
+                continue
+            job = self._load(filename[len("job_"):-len(".json")])
+            if job is None or job["status"] != "running" or job["id"] in self._jobs \
+                    or job.get("owner_token") == PROCESS_TOKEN:
+                continue
+            # After a container restart our own pid may be reused, so it never counts as a live owner.
+            owner_pid = job.get("owner_pid")
+            if owner_pid != os.getpid() and _pid_alive(owner_pid):
+                continue
+            if not self._claim(job):
+                continue  # another worker took it over
+            job["owner_pid"] = os.getpid()
+            job["owner_token"] = PROCESS_TOKEN
+            self._jobs[job["id"]] = job
+            self._save(job)
+            self._start(job)
+            resumed += 1
+        if resumed:
+            print(f"--- Resumed {resumed} unfinished ranking job(s). ---")
+
+    # --- Execution ---
+    def _start(self, job):
+        self._tasks[job["id"]] = asyncio.create_task(self._run(job))
+
+    async def _run(self, job):
+        try:
+            resumes = await asyncio.to_thread(self.vector_store_manager.get_document_texts)
+            job["total"] = len(resumes)
+            await self._asave(job, force=True)
+
+            semaphore = asyncio.Semaphore(self.concurrency)
+
+            async def score(source, text):
+                async with semaphore:
+                    await self._score_candidate(job, source, text)
+
+            # Map: one small scoring call per resume, skipping those already scored.
+            await asyncio.gather(*(
+                score(source, text) for source, text in resumes.items() if source not in job["results"]
+            ))
+            # Reduce: the ranking is merged from the per-candidate scores on read.
+            job["status"] = "completed"
+        except Exception as e:
+            print(f"!!! Ranking job {job['id']} failed: {e}")
+            job["status"] = "failed"
+            job["errors"]["job"] = str(e)
+        finally:
+            job["updated_at"] = time.time()
+            self._save(job)
+            self._tasks.pop(job["id"], None)
+            self._last_saved.pop(job["id"], None)
+            if job["status"] != "running":
+                self._remove_claims(job["id"])
+
+    async def _score_candidate(self, job, source, text):
+        resume_hash = _sha256(text)
+        result = self.score_cache.get(job["jd_hash"], resume_hash)
+        try:
+            if result is None:
+                output = await self.scorer_chain.ainvoke({
+                    "job_description": job["job_description"],
+                    "source": source,
+                    "resume": text[:MAX_RESUME_CHARS],
+                })
+                result = parse_candidate_score(output)
+                await asyncio.to_thread(self.score_cache.put, job["jd_hash"], resume_hash, result)
+            job["results"][source] = dict(result, resume_hash=resume_hash)
+            job["errors"].pop(source, None)
+        except Exception as e:
+            print(f"!!! Failed to score '{source}' for ranking job {job['id']}: {e}")
+            job["errors"][source] = str(e)
+        job["updated_at"] = time.time()
+        await self._asave(job)
@@ -0,0 +1,122 @@
+# startup.py
+import time
+import asyncio
+
+
+class ComponentRegistry:
+    """
+    Builds the application's heavy components (LLM clients, vector store, agents) lazily.
+    Each component is built once, in a worker thread, after its dependencies. Components can
+    be warmed up in the background at startup or built on first use, and their readiness
+    and build times are tracked for the /readyz endpoint and the startup timing report.
+    """
+    def __init__(self):
+        self._factories = {}
+        self._values = {}
+        self._tasks = {}
+        self._ready_callbacks = {}
+        self._background_tasks = set()  # strong references; asyncio only keeps weak ones
+        self.errors = {}
+        self.timings = {}
+
+    def register(self, name, factory, depends_on=()):
+        """
+        Registers a component. `factory` is a blocking callable that receives the built
+        dependencies as positional arguments, in the order given by `depends_on`.
+        """
+        self._factories[name] = (factory, tuple(depends_on))
+
+    async def get(self, name):
+        """Returns the component, building it (and its dependencies) if needed."""
+        if name in self._values:
+            return self._values[name]
+        task = self._tasks.get(name)
+        if task is None:
+            task = asyncio.ensure_future(self._build(name))
+            self._tasks[name] = task
+        # Shield so a cancelled request does not abort a build other requests are waiting on.
+        return await asyncio.shield(task)
+
+    def on_ready(self, name, callback):
+        """
+        Calls `callback(component)` on the event loop once `name` has been built, without
+        triggering the build itself. Runs immediately if the component is already ready.
+        """
+        if name in self._values:
+            callback(self._values[name])
+        else:
+            self._ready_callbacks.setdefault(name, []).append(callback)
+
+    def get_if_ready(self, name):
+        """Returns the component if it has already been built, otherwise None."""
+        return self._values.get(name)
+
+    async def _build(self, name):
+        factory, depends_on = self._factories[name]
+        try:
+            dependencies = [await self.get(dependency) for dependency in depends_on]
+            print(f"--- Warming up component '{name}'... ---")
+            start = time.perf_counter()
+            value = await asyncio.to_thread(factory, *dependencies)
+        except Exception as e:
+            print(f"!!! Failed to initialize component '{name}': {e}")
+            self.errors[name] = str(e)
+            # Forget the failed build so the next request retries it.
+            self._tasks.pop(name, None)
+            raise
+        self.timings[name] = time.perf_counter() - start
+        self.errors.pop(name, None)
+        self._values[name] = value
+        print(f"--- Component '{name}' ready in {self.timings[name]:.2f}s. ---")
+        for callback in self._ready_callbacks.pop(name, []):
+            try:
+                callback(value)
+            except Exception as e:
+                print(f"!!! Ready callback for component '{name}' failed: {e}")
+        return value
+
+    def warm_up_in_background(self, names=None):
+        """Starts building the given components (default: all) without waiting for them."""
+        names = list(names or self._factories)
+
+        async def warm_up():
+            start = time.perf_counter()
+            results = await asyncio.gather(*(self.get(name) for name in names), return_exceptions=True)
+            failed = [name for name, result in zip(names, results) if isinstance(result, Exception)]
+            self.timings["warm_up_total"] = time.perf_counter() - start
+            if failed:
+                print(f"!!! Background warm-up finished with failures: {failed}")
+            else:
+                print(f"--- Background warm-up complete in {self.timings['warm_up_total']:.2f}s. ---")
+
+        task = asyncio.create_task(warm_up())
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+        return task
+
+    def status(self, name):
+        if name in self._values:
+            return "ready"
+        if name in self._tasks:
+            return "warming"
+        if name in self.errors:
+            return "failed"
+        return "pending"
+
+    def readiness(self):
+        """Per-component readiness, e.g. {"vector_store": "ready", "orchestrator": "warming"}."""
+        return {name: self.status(name) for name in self._factories}
+
+    def all_ready(self):
+        return all(name in self._values for name in self._factories)
+
+    def ready(self, expected=None):
+        """
+        Deployment readiness: no component has failed and every component in `expected`
+        (default: all) is built. With lazy startup pass `expected=()`, since components are
+        only built when an endpoint first needs them and "pending" is their normal state.
+        """
+        if self.errors:
+            return False
+        names = self._factories if expected is None else expected
+        return all(name in self._values for name in names)
@@ -15,6 +15,38 @@ class Candidate(BaseModel):
     summary: str = Field(..., description="A brief summary of the candidate's profile.")
 
 
+def _split_candidate_blocks(talent_scout_output):
+    """
+    Splits the TalentScout report into its header and the non-empty candidate blocks.
+    The '---' separator from the prompt makes this reliable.
+    """
+    candidate_blocks = talent_scout_output.split('---')
+    header = candidate_blocks[0] if candidate_blocks else ""
+    return header, [block for block in candidate_blocks[1:] if block.strip()]
+
+
+def _text_to_check(block):
+    """Extracts the Justification and Summary fields of a candidate block for the bias check."""
+    summary_match = re.search(r"-\s*\*\*Summary:\*\*\s*(.*)", block, re.DOTALL)
+    justification_match = re.search(r"-\s*\*\*Justification:\*\*\s*(.*)", block, re.DOTALL)
+
+    text_to_check = ""
+    if justification_match:
+        text_to_check += justification_match.group(1).strip() + " "
+    if summary_match:
+        text_to_check += summary_match.group(1).strip()
+    return text_to_check
+
+
+def _assemble_report(header, blocks, bias_results):
+    """Appends each candidate's bias check result as a new "Bias Analysis" field."""
+    final_report_parts = [header]
+    for block, bias_analysis_result in zip(blocks, bias_results):
+        enhanced_block = block.strip() + f"\n    - **Bias Analysis:** {bias_analysis_result.strip()}"
+        final_report_parts.append(enhanced_block)
+    return "\n\n---\n".join(final_report_parts)
+
+
 # This is the new function that will orchestrate the two agents.
 def run_scout_and_bias_check(input_data, talent_scout_chain, bias_checker_chain):
     """
@@ -25,48 +57,38 @@ def run_scout_and_bias_check(input_data, talent_scout_chain, bias_checker_chain)
     4. Appends the bias check result to the final output.
     """
     print("--- Running TalentScout analysis... ---")
-    # 1. Get the initial analysis from the TalentScout agent
     talent_scout_output = talent_scout_chain.invoke(input_data)
 
     print("--- TalentScout analysis complete. Now running automatic bias check... ---")
+    header, blocks = _split_candidate_blocks(talent_scout_output)
+    texts = [_text_to_check(block) for block in blocks]
+    checked = bias_checker_chain.batch([text for text in texts if text]) if any(texts) else []
 
-    # 2. Parse the output to process each candidate individually.
-    # The '---' separator from the prompt makes this reliable.
-    candidate_blocks = talent_scout_output.split('---')
-
-    final_report_parts = []
+    checked_iter = iter(checked)
+    bias_results = [next(checked_iter) if text else "Bias check could not be performed." for text in texts]
 
-    # We process each block. The first block is usually the header, so we process it differently.
-    if candidate_blocks:
-        final_report_parts.append(candidate_blocks[0])  # Keep the header
-
-    for block in candidate_blocks[1:]:
-        if not block.strip():
-            continue
+    print("--- Bias check complete. ---")
+    return _assemble_report(header, blocks, bias_results)
 
-        # 3. For each candidate, find the summary to be analyzed.
-        # We look for the "Summary:" and "Justification:" fields.
-        summary_match = re.search(r"-\s*\*\*Summary:\*\*\s*(.*)", block, re.DOTALL)
-        justification_match = re.search(r"-\s*\*\*Justification:\*\*\s*(.*)", block, re.DOTALL)
 
-        text_to_check = ""
-        if justification_match:
-            text_to_check += justification_match.group(1).strip() + " "
-        if summary_match:
-            text_to_check += summary_match.group(1).strip()
+async def arun_scout_and_bias_check(input_data, talent_scout_chain, bias_checker_chain):
+    """
+    Async version of run_scout_and_bias_check: retrieval and the LLM call use ainvoke and
+    all candidates are bias-checked concurrently with abatch.
+    """
+    print("--- Running TalentScout analysis... ---")
+    talent_scout_output = await talent_scout_chain.ainvoke(input_data)
 
-        bias_analysis_result = "Bias check could not be performed."
-        if text_to_check:
-            # Run the BiasChecker on the extracted text
-            bias_analysis_result = bias_checker_chain.invoke(text_to_check)
+    print("--- TalentScout analysis complete. Now running automatic bias check... ---")
+    header, blocks = _split_candidate_blocks(talent_scout_output)
+    texts = [_text_to_check(block) for block in blocks]
+    checked = await bias_checker_chain.abatch([text for text in texts if text]) if any(texts) else []
 
-        # 4. Append the bias check result to the candidate's block.
-        # We add a new "Bias Analysis" field to the output.
-        enhanced_block = block.strip() + f"\n    - **Bias Analysis:** {bias_analysis_result.strip()}"
-        final_report_parts.append(enhanced_block)
+    checked_iter = iter(checked)
+    bias_results = [next(checked_iter) if text else "Bias check could not be performed." for text in texts]
 
     print("--- Bias check complete. ---")
-    return "\n\n---\n".join(final_report_parts)
+    return _assemble_report(header, blocks, bias_results)
 
 
 # We modify the main creation function to accept the bias_checker_chain
@@ -138,12 +160,21 @@ Based on your request, here is the analysis:
     )
 
     # This is the meta-chain that adds the automatic bias check.
+    # It has a native coroutine path so async callers never fall back to a thread executor.
+    async def arun(input_data):
+        return await arun_scout_and_bias_check(
+            input_data,
+            talent_scout_chain=base_talent_scout_chain,
+            bias_checker_chain=bias_checker_chain
+        )
+
     enhanced_chain = RunnableLambda(
         lambda input_data: run_scout_and_bias_check(
             input_data,
             talent_scout_chain=base_talent_scout_chain,
             bias_checker_chain=bias_checker_chain
-        )
+        ),
+        afunc=arun,
     )
 
     print("TalentScout meta-chain with automatic bias check created successfully (v2 with specificity).")
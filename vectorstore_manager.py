@@ -1,116 +1,498 @@
 # vectorstore_manager.py
 import os
+import re
+import uuid
+import asyncio
+import threading
+import contextvars
+from typing import Any, List
+from concurrent.futures import ThreadPoolExecutor
 import chromadb
+from chromadb.config import Settings
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, single-worker use is not enforced
+    fcntl = None
 from langchain_community.vectorstores import Chroma
-from langchain_community.document_loaders import PyPDFLoader
 from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
 
 # Local Imports
 from security import create_guardrails_agent, sanitize_text_chunk # Import sanitize_text_chunk
+from pdf_extraction import PDFExtractor
+from compact_index import CompactVectorIndex, CompactRetriever
 
 # --- Configuration ---
 PERSIST_DIRECTORY = "chroma_db"
 CHROMA_COLLECTION_NAME = "hr_documents"
+# "embedded" opens chroma_db in-process (single worker only); "server" talks to a Chroma
+# server (e.g. `chroma run --path chroma_db --port 8001`) shared by all uvicorn workers.
+CHROMA_MODE = os.getenv("CHROMA_MODE", "embedded").lower()
+CHROMA_HOST = os.getenv("CHROMA_HOST", "localhost")
+CHROMA_PORT = int(os.getenv("CHROMA_PORT", "8001"))
+
+# ANN index configuration. Chroma fixes the distance, M and ef_construction when the collection
+# is created, so changing them requires re-ingesting into a new one; ef_search is applied to
+# an existing collection at startup.
+INDEX_DISTANCE = os.getenv("INDEX_DISTANCE", "l2")  # "l2", "cosine" or "ip"
+HNSW_M = int(os.getenv("HNSW_M", "16"))
+HNSW_EF_CONSTRUCTION = int(os.getenv("HNSW_EF_CONSTRUCTION", "100"))
+HNSW_EF_SEARCH = int(os.getenv("HNSW_EF_SEARCH", "10"))
+
+# Compact mode: "off" uses Chroma's float32 HNSW index. "float16" or "int8" keeps only
+# compact vectors in RAM (full-precision copies on disk) and re-ranks the top candidates exactly.
+COMPACT_VECTORS = os.getenv("COMPACT_VECTORS", "off").lower()
+COMPACT_INDEX_DIRECTORY = os.getenv("COMPACT_INDEX_DIRECTORY", "compact_index")
+COMPACT_RERANK_FACTOR = int(os.getenv("COMPACT_RERANK_FACTOR", "4"))
+COMPACT_BACKFILL_BATCH = 1000  # rows copied at a time from the float32 collection
+
+# Sanitize/embed/store steps of uploads run on their own small pool. Their LLM calls wait in
+# the scheduler's ingest queue, and parking those waits on the event loop's default executor
+# would starve the threads /chat needs for retrieval.
+INGEST_THREADS = int(os.getenv("INGEST_THREADS", "2"))
+_ingest_executor = ThreadPoolExecutor(max_workers=INGEST_THREADS, thread_name_prefix="ingest")
+
+# Resume chunking: one chunk per section; only very small sections are merged into a neighbour.
+RESUME_CHUNK_SIZE = 1500
+RESUME_CHUNK_OVERLAP = 100  # only used when a single section is longer than RESUME_CHUNK_SIZE
+RESUME_MIN_SECTION_CHARS = 80  # shorter sections (e.g. a one-line "Languages") are folded into a neighbour
+RESUME_SECTION_HEADINGS = {
+    "summary": ["summary", "professional summary", "profile", "objective", "career objective", "about me"],
+    "experience": ["experience", "work experience", "professional experience", "work history",
+                   "employment", "employment history", "career history"],
+    "education": ["education", "academic background", "qualifications", "academic qualifications"],
+    "skills": ["skills", "technical skills", "core competencies", "competencies", "technologies", "tools"],
+    "certifications": ["certifications", "certificates", "licenses", "licenses and certifications",
+                       "licenses & certifications", "courses"],
+}
+_HEADING_TO_SECTION = {
+    heading: section for section, headings in RESUME_SECTION_HEADINGS.items() for heading in headings
+}
+# A heading is a short line on its own, optionally bullet-prefixed, colon-suffixed and
+# wrapped in markdown emphasis or heading marks (e.g. "## Skills", "**Summary**", "__Education:__").
+_HEADING_RE = re.compile(r"^[\s#*_\-•]*([A-Za-z &/]{3,40}?)[\s*_#]*:?[\s*_#]*$")
+
+
+def detect_resume_sections(text):
+    """
+    Splits resume text into (section, body) pairs in document order.
+    Text before the first recognised heading is treated as the contact section.
+    """
+    sections = []
+    current, lines = "contact", []
+    for line in text.splitlines():
+        match = _HEADING_RE.match(line)
+        section = _HEADING_TO_SECTION.get(match.group(1).strip().lower()) if match else None
+        if section:
+            sections.append((current, "\n".join(lines).strip()))
+            current, lines = section, []
+        else:
+            lines.append(line)
+    sections.append((current, "\n".join(lines).strip()))
+    return [(section, body) for section, body in sections if body]
+
+
+def _candidate_label(sections):
+    """Candidate name from the first line of the contact block, used to label every chunk."""
+    if not sections or sections[0][0] != "contact":
+        return ""
+    first_line = sections[0][1].strip().splitlines()[0]
+    return re.sub(r"^[\W\d_]+", "", first_line).strip()[:60]
+
+
+def split_resume_documents(documents):
+    """
+    Resume-aware chunking: merges a resume's pages, cuts it at section boundaries and emits
+    one chunk per section, tagged with that section's name in `section` metadata so it can
+    be used in a Chroma `where` filter. The contact block and sections shorter than
+    RESUME_MIN_SECTION_CHARS are folded into the following section, or the preceding one
+    at the end. Sections longer than RESUME_CHUNK_SIZE are split further with a small
+    overlap. Every chunk starts with the candidate's name so it can be attributed on its own.
+    Falls back to generic splitting when no section headings are found.
+    """
+    if not documents:
+        return []
+    metadata = {key: value for key, value in documents[0].metadata.items() if key != "page"}
+    text = "\n".join(doc.page_content for doc in documents)
+    sections = detect_resume_sections(text)
+
+    if all(section == "contact" for section, _ in sections):
+        fallback_splitter = RecursiveCharacterTextSplitter(chunk_size=RESUME_CHUNK_SIZE, chunk_overlap=RESUME_CHUNK_OVERLAP)
+        return [
+            Document(page_content=chunk, metadata=dict(metadata, section="unknown"))
+            for chunk in fallback_splitter.split_text(text)
+        ]
+
+    section_splitter = RecursiveCharacterTextSplitter(
+        chunk_size=RESUME_CHUNK_SIZE,
+        chunk_overlap=RESUME_CHUNK_OVERLAP,
+        separators=["\n\n", "\n", ". ", " ", ""],
+    )
+    candidate = _candidate_label(sections)
+
+    # Group each section with any small sections folded into it: [(section, [(name, body)])]
+    groups, carried = [], []
+    for section, body in sections:
+        carried.append((section, body))
+        if section != "contact" and len(body) >= RESUME_MIN_SECTION_CHARS:
+            groups.append((section, carried))
+            carried = []
+    if carried:
+        if groups:
+            groups[-1][1].extend(carried)
+        else:
+            groups.append((carried[-1][0], carried))
+
+    chunks = []
+    for section, parts in groups:
+        header = f"{candidate} - {section.capitalize()}" if candidate else section.capitalize()
+        body = "\n\n".join(f"{name.capitalize()}:\n{part}" if name != section else part for name, part in parts)
+        for piece in section_splitter.split_text(body):
+            chunks.append(Document(page_content=f"{header}:\n{piece}", metadata=dict(metadata, section=section)))
+    return chunks
+
+
+# Directory handle holding this process's exclusive lock on PERSIST_DIRECTORY (embedded mode).
+_store_lock_fd = None
+
+
+def lock_persist_directory(path=PERSIST_DIRECTORY):
+    """
+    Takes an exclusive, process-lifetime lock on the embedded store's directory, so a second
+    process (e.g. another `uvicorn --workers N` worker) fails fast instead of opening the
+    same PersistentClient. The OS releases the lock when the process exits.
+    """
+    global _store_lock_fd
+    if fcntl is None or _store_lock_fd is not None:
+        return
+    os.makedirs(path, exist_ok=True)
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        os.close(fd)
+        raise ValueError(
+            f"'{path}' is already in use by another process. CHROMA_MODE=embedded cannot be "
+            "shared by multiple worker processes; set CHROMA_MODE=server to run with --workers > 1."
+        )
+    _store_lock_fd = fd
+
+
+def create_chroma_client(mode=CHROMA_MODE):
+    """
+    Creates the Chroma client for the configured store mode.
+    In server mode each worker process keeps one HTTP client, whose keep-alive connection
+    pool is reused by every request in that worker.
+    """
+    if mode == "server":
+        return chromadb.HttpClient(
+            host=CHROMA_HOST,
+            port=CHROMA_PORT,
+            settings=Settings(anonymized_telemetry=False),
+        )
+    if mode == "embedded":
+        lock_persist_directory()
+        return chromadb.PersistentClient(path=PERSIST_DIRECTORY)
+    raise ValueError(f"Unknown CHROMA_MODE '{mode}'. Expected 'embedded' or 'server'.")
+
+
+def index_metadata(distance=INDEX_DISTANCE, m=HNSW_M, ef_construction=HNSW_EF_CONSTRUCTION, ef_search=HNSW_EF_SEARCH):
+    """Chroma collection metadata for the configured HNSW index."""
+    return {
+        "hnsw:space": distance,
+        "hnsw:M": m,
+        "hnsw:construction_ef": ef_construction,
+        "hnsw:search_ef": ef_search,
+    }
+
+
+def effective_index_settings(collection):
+    """
+    The HNSW settings a collection actually uses, keyed like index_metadata(). Read from the
+    collection configuration where available, since its metadata keeps the creation values.
+    """
+    hnsw = (getattr(collection, "configuration_json", None) or {}).get("hnsw")
+    if not hnsw:
+        return dict(collection.metadata or {})
+    return {
+        "hnsw:space": hnsw.get("space"),
+        "hnsw:M": hnsw.get("max_neighbors"),
+        "hnsw:construction_ef": hnsw.get("ef_construction"),
+        "hnsw:search_ef": hnsw.get("ef_search"),
+    }
+
+
+def sync_index_settings(collection, wanted=None):
+    """
+    Brings an existing collection in line with the configured index. Chroma ignores HNSW
+    metadata for a collection that already exists, so ef_search (the one mutable setting)
+    is applied explicitly and drift in the creation-time settings is reported.
+    """
+    wanted = wanted or index_metadata()
+    current = effective_index_settings(collection)
+    if current.get("hnsw:search_ef") not in (None, wanted["hnsw:search_ef"]):
+        try:
+            collection.modify(configuration={"hnsw": {"ef_search": wanted["hnsw:search_ef"]}})
+            print(f"--- Applied HNSW ef_search={wanted['hnsw:search_ef']} to collection '{collection.name}'. ---")
+        except Exception as e:
+            print(f"!!! Could not apply HNSW ef_search to collection '{collection.name}': {e}")
+    drift = {
+        key: (current.get(key), wanted[key])
+        for key in ("hnsw:space", "hnsw:M", "hnsw:construction_ef")
+        if current.get(key) is not None and current.get(key) != wanted[key]
+    }
+    if drift:
+        details = ", ".join(f"{key}={have} (configured {want})" for key, (have, want) in drift.items())
+        print(
+            f"!!! WARNING: collection '{collection.name}' was created with {details}. "
+            "These are fixed at creation; re-ingest into a new collection to apply them."
+        )
+
+
+class ChromaRetriever(BaseRetriever):
+    """
+    Retriever over the Chroma HNSW store with a native async path. LangChain's Chroma has
+    no async search, so its default ainvoke runs the sync search (and the sync, scheduled
+    query embedding) on the event loop's default executor. Here the query embedding is
+    awaited and only the local vector search runs in a worker thread.
+    """
+    vector_store: Any
+    embeddings: Any
+    k: int = 4
+
+    def _get_relevant_documents(self, query, *, run_manager=None) -> List[Document]:
+        return self.vector_store.similarity_search(query, k=self.k)
+
+    async def _aget_relevant_documents(self, query, *, run_manager=None) -> List[Document]:
+        query_vector = await self.embeddings.aembed_query(query)
+        return await asyncio.to_thread(self.vector_store.similarity_search_by_vector, query_vector, self.k)
+
 
 class VectorStoreManager:
     """
     Manages the persistent vector store for the application.
     Handles initialization, adding documents, and providing a retriever.
     """
-    def __init__(self, embeddings, llm=None):  # Added llm as an argument
+    def __init__(self, embeddings, llm=None, guardrails_agent=None, compact_vectors=COMPACT_VECTORS):  # Added llm as an argument
         self.embeddings = embeddings
         self.llm = llm # Store the llm instance
         
-        # Initialize the persistent ChromaDB client
-        self.client = chromadb.PersistentClient(path=PERSIST_DIRECTORY)
+        # PDF text extraction runs in a process pool, off the request thread
+        self.pdf_extractor = PDFExtractor()
+
+        # Initialize the ChromaDB client (embedded or shared server)
+        self.client = create_chroma_client()
         
         # Initialize the LangChain Chroma vector store
-        self.vector_store = Chroma(
-            client=self.client,
-            collection_name=CHROMA_COLLECTION_NAME,
-            embedding_function=self.embeddings,
-        )
+        self.compact_index = None
+        if compact_vectors == "off":
+            self.vector_store = Chroma(
+                client=self.client,
+                collection_name=CHROMA_COLLECTION_NAME,
+                embedding_function=self.embeddings,
+                collection_metadata=index_metadata(),
+            )
+            sync_index_settings(self.vector_store._collection)
+            # Compact mode backfills from this collection, but its own uploads never flow back.
+            compact_collection = self._existing_collection(f"{CHROMA_COLLECTION_NAME}_compact")
+            if compact_collection is not None and compact_collection.count() > self.vector_store._collection.count():
+                print(
+                    f"!!! WARNING: '{CHROMA_COLLECTION_NAME}_compact' holds chunks that are not in "
+                    f"'{CHROMA_COLLECTION_NAME}'. Documents uploaded while COMPACT_VECTORS was enabled "
+                    "are not visible in HNSW mode; re-upload them."
+                )
+        else:
+            # The compact index is process-local, so it cannot be shared between workers.
+            if CHROMA_MODE != "embedded":
+                raise ValueError("COMPACT_VECTORS requires CHROMA_MODE=embedded.")
+            # Chroma keeps only text and metadata here (with 1-d placeholder embeddings);
+            # the vectors live in the compact index.
+            self.vector_store = Chroma(
+                client=self.client,
+                collection_name=f"{CHROMA_COLLECTION_NAME}_compact",
+                embedding_function=self.embeddings,
+            )
+            self.compact_index = CompactVectorIndex(
+                COMPACT_INDEX_DIRECTORY,
+                dtype=compact_vectors,
+                metric=INDEX_DISTANCE,
+                rerank_factor=COMPACT_RERANK_FACTOR,
+            )
+            self._backfill_compact()
         
-        # Initialize the guardrails agent here to avoid re-initialization
-        self.guardrails_agent = None
-        if self.llm:
+        # Reuse the application's guardrails agent if one is provided, otherwise build our own
+        self.guardrails_agent = guardrails_agent
+        if self.guardrails_agent is None and self.llm:
             self.guardrails_agent = create_guardrails_agent(self.llm) # Use self.llm
         
-        print(f"--- VectorStoreManager initialized. Using '{PERSIST_DIRECTORY}' for storage. ---")
+        # Cached document list, validated against the shared collection's count so that
+        # uploads made through any worker invalidate it in every worker.
+        self._documents_cache = None
+        self._documents_cache_count = None
+        self._cache_lock = threading.Lock()
+
+        storage = f"Chroma server at {CHROMA_HOST}:{CHROMA_PORT}" if CHROMA_MODE == "server" else f"'{PERSIST_DIRECTORY}'"
+        print(f"--- VectorStoreManager initialized. Using {storage} for storage. ---")
         print(f"Current document count: {self.vector_store._collection.count()}")
 
-    def add_document_from_upload(self, uploaded_file):
+    async def aadd_document(self, data, filename):
         """
-        Processes an uploaded file, splits it into chunks, and adds it to the vector store.
-        The file is saved temporarily for processing and then deleted.
+        Async variant for the upload endpoint: extraction runs in the process pool and the
+        sanitize/embed/store steps on the ingest pool, so the event loop is never blocked.
         """
-        temp_dir = "temp_uploads"
-        if not os.path.exists(temp_dir):
-            os.makedirs(temp_dir)
-            
-        temp_filepath = os.path.join(temp_dir, uploaded_file.filename)
-
         try:
-            # Save the uploaded file temporarily
-            with open(temp_filepath, "wb") as buffer:
-                buffer.write(uploaded_file.file.read())
-
-            # Load the PDF
-            print(f"--- Processing document: {uploaded_file.filename} ---")
-            loader = PyPDFLoader(temp_filepath)
-            documents = loader.load()
-            
-            # Add source metadata to each document chunk
-            for doc in documents:
-                doc.metadata["source"] = uploaded_file.filename
-            
-            # Split the document into chunks
-            text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
-            docs = text_splitter.split_documents(documents)
-
-            # Sanitize each document chunk before adding it to the vector store
-            if self.guardrails_agent:
-                sanitized_docs = []
-                for doc in docs:
-                    # Ensure doc has page_content attribute
-                    if hasattr(doc, 'page_content'):
-                        doc.page_content = sanitize_text_chunk(doc.page_content, self.guardrails_agent)
-                    else:
-                        print(f"Warning: Document chunk missing 'page_content'. Skipping sanitization.")
-                    sanitized_docs.append(doc)
-                docs = sanitized_docs
-
-            # Add the documents to the persistent vector store
-            self.vector_store.add_documents(sanitized_docs)
-            
-            print(f"--- Document '{uploaded_file.filename}' added successfully. ---")
-            print(f"New document count: {self.vector_store._collection.count()}")
-            
+            print(f"--- Processing document: {filename} ---")
+            documents = await self.pdf_extractor.aextract(data, filename)
+            # Copy the context so the scheduler still sees the caller's "ingest" workload.
+            context = contextvars.copy_context()
+            await asyncio.get_running_loop().run_in_executor(
+                _ingest_executor, context.run, self.add_parsed_documents, documents, filename
+            )
         except Exception as e:
-            print(f"!!! Error processing document {uploaded_file.filename}: {e}")
+            print(f"!!! Error processing document {filename}: {e}")
             raise
-        finally:
-            # Clean up the temporary file
-            if os.path.exists(temp_filepath):
-                os.remove(temp_filepath)
+
+    def add_parsed_documents(self, documents, filename):
+        """
+        Splits already-extracted page documents into section-scoped chunks, sanitizes them
+        and adds them to the vector store.
+        """
+        # Split the resume into section-scoped chunks
+        docs = split_resume_documents(documents)
+
+        # Sanitize each document chunk before adding it to the vector store
+        if self.guardrails_agent:
+            for doc in docs:
+                doc.page_content = sanitize_text_chunk(doc.page_content, self.guardrails_agent)
+
+        # Add the documents to the persistent vector store
+        if self.compact_index is None:
+            self.vector_store.add_documents(docs)
+        else:
+            self._add_compact(docs)
+
+        print(f"--- Document '{filename}' added successfully. ---")
+        print(f"New document count: {self.vector_store._collection.count()}")
+
+    def _existing_collection(self, name):
+        try:
+            return self.client.get_collection(name)
+        except Exception:
+            return None
+
+    def _backfill_compact(self):
+        """
+        On the first start in compact mode, copies every chunk already ingested into the
+        float32 HNSW collection (text, metadata and stored embedding) into the compact
+        collection and index, so switching modes does not hide existing resumes.
+        Idempotent: ids already in the compact index are skipped, so an interrupted
+        backfill simply resumes on the next start.
+        """
+        marker = os.path.join(COMPACT_INDEX_DIRECTORY, "backfilled")
+        if os.path.exists(marker):
+            return
+        source = self._existing_collection(CHROMA_COLLECTION_NAME)
+        total = source.count() if source is not None else 0
+        if total:
+            print(f"--- Backfilling {total} chunks from '{CHROMA_COLLECTION_NAME}' into the compact index... ---")
+            copied = 0
+            for offset in range(0, total, COMPACT_BACKFILL_BATCH):
+                batch = source.get(
+                    include=["embeddings", "documents", "metadatas"],
+                    limit=COMPACT_BACKFILL_BATCH,
+                    offset=offset,
+                )
+                known = set(self.compact_index.ids)
+                rows = [
+                    (doc_id, text, meta, vector)
+                    for doc_id, text, meta, vector in zip(batch["ids"], batch["documents"], batch["metadatas"], batch["embeddings"])
+                    if doc_id not in known
+                ]
+                if not rows:
+                    continue
+                ids = [row[0] for row in rows]
+                self.vector_store._collection.upsert(
+                    ids=ids,
+                    documents=[row[1] for row in rows],
+                    metadatas=[row[2] for row in rows],
+                    embeddings=[[0.0] for _ in rows],
+                )
+                self.compact_index.add(ids, [row[3] for row in rows])
+                copied += len(rows)
+            print(f"--- Backfill complete: {copied} chunks copied. ---")
+        with open(marker, "w", encoding="utf-8") as f:
+            f.write(str(total))
+
+    def _add_compact(self, docs):
+        texts = [doc.page_content for doc in docs]
+        ids = [uuid.uuid4().hex for _ in docs]
+        vectors = self.embeddings.embed_documents(texts)
+        self.vector_store._collection.add(
+            ids=ids,
+            documents=texts,
+            metadatas=[doc.metadata for doc in docs],
+            embeddings=[[0.0] for _ in docs],
+        )
+        self.compact_index.add(ids, vectors)
 
     def get_retriever(self, k_value=15):
         """
         Returns a retriever from the vector store.
         """
-        return self.vector_store.as_retriever(search_kwargs={"k": k_value})
+        if self.compact_index is not None:
+            return CompactRetriever(
+                index=self.compact_index,
+                collection=self.vector_store._collection,
+                embeddings=self.embeddings,
+                k=k_value,
+            )
+        return ChromaRetriever(vector_store=self.vector_store, embeddings=self.embeddings, k=k_value)
+
+    def index_config(self) -> dict:
+        """
+        Reports the effective index configuration and, in compact mode, its vector memory.
+        """
+        if self.compact_index is not None:
+            return {
+                "mode": f"compact-{self.compact_index.dtype}",
+                "distance": self.compact_index.metric,
+                "rerank_factor": self.compact_index.rerank_factor,
+                "vectors": len(self.compact_index.ids),
+                "vector_memory_bytes": self.compact_index.memory_bytes(),
+            }
+        return {"mode": "hnsw", **effective_index_settings(self.vector_store._collection)}
+
+    def get_document_texts(self) -> dict[str, str]:
+        """
+        Returns the full stored text of every document, keyed by source filename.
+        Chunks are joined in insertion order.
+        """
+        collection_data = self.vector_store._collection.get(include=["documents", "metadatas"])
+        texts = {}
+        for text, meta in zip(collection_data.get('documents') or [], collection_data.get('metadatas') or []):
+            if meta and 'source' in meta:
+                texts.setdefault(meta['source'], []).append(text)
+        return {source: "\n\n".join(chunks) for source, chunks in texts.items()}
 
     def list_documents(self) -> list[str]:
         """
         NEW METHOD: Lists the unique source documents currently in the vector store.
         """
+        # count() is a cheap call; only refetch all metadata if the collection changed
+        count = self.vector_store._collection.count()
+        with self._cache_lock:
+            if self._documents_cache is not None and self._documents_cache_count == count:
+                return list(self._documents_cache)
+
         # The .get() method without IDs fetches all entries in the collection
-        collection_data = self.vector_store._collection.get()
-        metadatas = collection_data.get('metadatas', [])
-        
-        if not metadatas:
-            return []
-        
+        collection_data = self.vector_store._collection.get(include=["metadatas"])
+        metadatas = collection_data.get('metadatas') or []
+
         # Extract unique source filenames from the metadata
-        source_files = {meta['source'] for meta in metadatas if 'source' in meta}
-        return sorted(list(source_files))
+        source_files = sorted({meta['source'] for meta in metadatas if meta and 'source' in meta})
+        with self._cache_lock:
+            self._documents_cache = source_files
+            self._documents_cache_count = count
+        return list(source_files)